@@ -1,5 +1,6 @@
 import os, json
 from openai import OpenAI
+from s_llm_cache import cached_completion
 from typing import Dict, Any, List
 
 def main(trends_data: Dict = {}, rss_headlines: List[str] = []) -> List[Dict[str, Any]]:
@@ -14,13 +15,17 @@ def main(trends_data: Dict = {}, rss_headlines: List[str] = []) -> List[Dict[str
     """
     user_prompt = f"Use the following intelligence to generate ideas. Google Trends Data: {json.dumps(trends_data)}. Recent News Headlines: {json.dumps(rss_headlines)}"
 
-    try:
+    def generate() -> List[Dict[str, Any]]:
         response = client.chat.completions.create(
             model='gpt-4o',
             messages=[{'role':'system', 'content':system_prompt}, {'role':'user', 'content':user_prompt}],
             response_format={"type": "json_object"}
         )
-        ideas = json.loads(response.choices[0].message.content).get("ideas", [])
+        return json.loads(response.choices[0].message.content).get("ideas", [])
+
+    try:
+        # Same trends and headlines within the TTL yield the same ideas without another call
+        ideas = cached_completion("openai", "gpt-4o", system_prompt, user_prompt, {"response_format": "json_object"}, generate)
         print(f"INFO: [Content-Brain] Generated {len(ideas)} new content ideas.")
         return ideas
     except Exception as e:
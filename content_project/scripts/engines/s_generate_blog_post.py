@@ -2,15 +2,16 @@
 
 import os
 import json
-import requests
+import s_http_client as http_client
+from s_llm_cache import cached_completion
 from typing import Dict, Any
 
 # --- Configuration ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={GEMINI_API_KEY}"
 
-def write_article(idea: Dict[str, Any]) -> Dict[str, Any]:
-    """Uses Gemini to write a full blog post based on a content idea."""
+def write_article(idea: Dict[str, Any], regenerate: bool = False) -> Dict[str, Any]:
+    """Uses Gemini to write a full blog post based on a content idea; `regenerate` bypasses the cached article."""
     print(f"Generating blog post for title: '{idea.get('title')}'")
 
     prompt = f"""
@@ -34,10 +35,14 @@ def write_article(idea: Dict[str, Any]) -> Dict[str, Any]:
     payload = {"contents": [{"parts": [{"text": prompt}]}]}
     headers = {"Content-Type": "application/json"}
 
-    try:
-        response = requests.post(GEMINI_API_URL, headers=headers, data=json.dumps(payload))
+    def generate() -> str:
+        response = http_client.post(GEMINI_API_URL, headers=headers, data=json.dumps(payload),
+                                   timeout=http_client.LONG_TIMEOUT, idempotent=True)
         response.raise_for_status()
-        article_markdown = response.json()['candidates'][0]['content']['parts'][0]['text']
+        return response.json()['candidates'][0]['content']['parts'][0]['text']
+
+    try:
+        article_markdown = cached_completion("gemini", "gemini-pro", None, prompt, {}, generate, refresh=regenerate)
         
         return {
             "status": "success",
@@ -47,12 +52,12 @@ def write_article(idea: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         return {"status": "error", "message": f"Failed to generate blog post: {e}"}
 
-def w_main(idea: Dict[str, Any]) -> Dict[str, Any]:
+def w_main(idea: Dict[str, Any], regenerate: bool = False) -> Dict[str, Any]:
     """Windmill entry point."""
     if not all(k in idea for k in ['title', 'concept', 'hook']):
         return {"status": "error", "message": "Idea must contain 'title', 'concept', and 'hook'."}
     
-    return write_article(idea)
+    return write_article(idea, regenerate)
 
 if __name__ == '__main__':
     mock_idea = {
@@ -3,9 +3,8 @@
 # Description: Generates a social media caption using a specified LLM.
 # It takes structured input from the smart_router and config.
 
-import json
-from openai import OpenAI # Assuming OpenAI for this example
-# Add other clients like `anthropic` or `google.generativeai` as needed.
+from s_llm_cache import cached_completion
+from s_model_dispatch import dispatch, engine_chain, parse_json_object
 
 # --- Main Function ---
 def main(
@@ -17,6 +16,7 @@ def main(
     openai_api_key: str, # Injected as a secret
     hashtag_count: int = 5,
     include_emojis: bool = True,
+    regenerate: bool = False,
 ) -> dict:
     """
     Generates a social media caption.
@@ -25,18 +25,17 @@ def main(
         topic: The subject of the caption.
         tone: The desired tone of voice.
         platform: The target social media platform.
-        model: The specific LLM to use.
+        model: The primary LLM; the fallbacks from engines.caption in model_routing.yaml follow it.
         system_prompt: A base prompt defining the AI's persona.
-        openai_api_key: The API key for the LLM provider.
+        openai_api_key: The OpenAI API key; other providers' keys come from their Windmill secrets.
         hashtag_count: Number of hashtags to generate.
         include_emojis: Whether to include emojis.
+        regenerate: Ask the model again instead of returning the cached caption, e.g. after a rejection.
         
     Returns:
         A dictionary with the generated caption and hashtags.
     """
     print(f"[Caption Engine] Generating caption for topic: {topic}")
-    
-    client = OpenAI(api_key=openai_api_key)
 
     platform_constraints = {
         "twitter": "Make it very concise (under 280 chars).",
@@ -59,23 +58,23 @@ def main(
     2. "hashtags": A list of strings, each being a hashtag starting with '#'.
     """
 
+    def generate() -> dict:
+        # Hedged across the primary and its fallbacks; an answer that is not valid JSON counts as a failure
+        result = dispatch("caption", system_prompt, user_prompt, primary_model=model, json_mode=True,
+                          parse=parse_json_object, api_keys={"openai": openai_api_key})
+        return {"model": result["model"], "output": result["output"]}
+
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        content = response.choices[0].message.content
-        result = json.loads(content)
+        # Identical requests (flow retries) are served from the shared cache unless a new draft was asked for
+        result = cached_completion("dispatch", model, system_prompt, user_prompt,
+                                   {"response_format": "json_object", "chain": engine_chain("caption", primary_model=model)},
+                                   generate, refresh=regenerate)
         
-        print("[Caption Engine] Successfully generated caption.")
+        print(f"[Caption Engine] Successfully generated caption with {result['model']}.")
         return {
             "status": "success",
-            "output": result,
-            "model_used": model
+            "output": result["output"],
+            "model_used": result["model"]
         }
 
     except Exception as e:
@@ -3,7 +3,7 @@
 # Description: Generates an image using a specified provider (Fal.ai or OpenAI).
 # Takes structured input from the smart_router and config.
 
-import requests
+import s_http_client as http_client
 from typing import Dict
 
 # --- Main Function ---
@@ -44,7 +44,7 @@ def generate_with_fal(prompt: str, model_path: str, key: str) -> Dict:
     payload = {"prompt": prompt}
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload, timeout=http_client.LONG_TIMEOUT, idempotent=True)
         response.raise_for_status()
         data = response.json()
         image_url = data.get("images", [{}])[0].get("url")
@@ -6,6 +6,7 @@
 import requests
 import json
 from typing import Dict
+from s_llm_cache import cached_completion
 
 # Assume a simple web scraper or a search API. For this example, we'll
 # just use a placeholder for fetching content. For a real implementation,
@@ -17,7 +18,8 @@ def main(
     article_url: str = None,
     generation_model: str = "claude-3-opus-20240229", # From config
     system_prompt: str = "You are a news analyst.", # From config
-    anthropic_api_key: str = None # Secret
+    anthropic_api_key: str = None, # Secret
+    regenerate: bool = False
 ) -> Dict:
     """
     Generates commentary on a news topic or article.
@@ -28,6 +30,7 @@ def main(
         generation_model: The LLM to use for commentary.
         system_prompt: The persona for the LLM.
         anthropic_api_key: API key for the generation model.
+        regenerate: Ask the model again instead of returning the cached commentary.
 
     Returns:
         A dictionary with the source and the commentary.
@@ -54,13 +57,17 @@ def main(
 
         user_prompt = f"Based on the following content, please generate commentary as instructed.\n\n**Article Content:**\n{article_content}"
 
-        message = client.messages.create(
-            model=generation_model,
-            max_tokens=1024,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
-        )
-        commentary = message.content[0].text
+        def generate() -> str:
+            message = client.messages.create(
+                model=generation_model,
+                max_tokens=1024,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_prompt}]
+            )
+            return message.content[0].text
+
+        commentary = cached_completion("anthropic", generation_model, system_prompt, user_prompt, {"max_tokens": 1024}, generate,
+                                       refresh=regenerate)
         
         print("[News Engine] Commentary generated successfully.")
         return {
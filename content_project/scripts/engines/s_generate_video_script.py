@@ -4,7 +4,7 @@
 # like Google Cloud Vertex AI. This is an asynchronous operation.
 
 import json
-import requests
+import s_http_client as http_client
 from typing import Dict
 
 # --- Main Function ---
@@ -51,7 +51,7 @@ def main(
 
     # --- Step 2: Make the Asynchronous Request ---
     try:
-        response = requests.post(api_endpoint, headers=headers, data=json.dumps(payload))
+        response = http_client.post(api_endpoint, headers=headers, data=json.dumps(payload), timeout=http_client.LONG_TIMEOUT)
         response.raise_for_status()
         operation_data = response.json()
         operation_name = operation_data.get("name")
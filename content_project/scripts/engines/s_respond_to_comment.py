@@ -1,9 +1,63 @@
 # Windmill: Main Python Function
 # Path: /engines/respond_to_comments.py
-# Description: Generates a reply to a social media comment using Claude.
+# Description: Generates a reply to a social media comment using Claude, or replies
+# to a batch of comments on the same post (main_batch).
 
-from typing import Dict
+from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from anthropic import Anthropic
+from s_llm_cache import cached_completion
+
+MAX_TOKENS = 500
+DEFAULT_MAX_CONCURRENCY = 4
+
+@lru_cache(maxsize=None)
+def get_client(anthropic_api_key: str) -> Anthropic:
+    # One client (and connection pool) per worker, shared by every reply
+    return Anthropic(api_key=anthropic_api_key)
+
+def build_system(system_prompt: str, original_post_context: str) -> List[Dict[str, Any]]:
+    """
+    The persona and the post as system blocks. The breakpoint on the last block lets
+    Anthropic cache the whole prefix, so every reply to the same post after the first
+    reads it from the prompt cache instead of paying for it again. Prefixes shorter
+    than the model's minimum cacheable length are simply sent uncached.
+    """
+    return [
+        {"type": "text", "text": system_prompt},
+        {"type": "text", "text": f"**Our Original Post's Content:**\n---\n{original_post_context}\n---",
+         "cache_control": {"type": "ephemeral"}},
+    ]
+
+def build_user_prompt(comment_text: str, comment_author: str) -> str:
+    return f"""
+    A user named '{comment_author}' left the following comment on our post.
+
+    **Their Comment:**
+    ---
+    {comment_text}
+    ---
+    
+    Please draft a reply based on your system instructions.
+    """
+
+def generate_reply(client: Anthropic, model: str, system: List[Dict[str, Any]], comment_text: str, comment_author: str,
+                   regenerate: bool = False) -> str:
+    user_prompt = build_user_prompt(comment_text, comment_author)
+
+    def generate() -> str:
+        message = client.messages.create(
+            model=model,
+            max_tokens=MAX_TOKENS,
+            system=system,
+            messages=[{"role": "user", "content": user_prompt}]
+        )
+        return message.content[0].text
+
+    cache_system = "\n".join(block["text"] for block in system)
+    return cached_completion("anthropic", model, cache_system, user_prompt, {"max_tokens": MAX_TOKENS}, generate,
+                             refresh=regenerate)
 
 # --- Main Function ---
 def main(
@@ -12,7 +66,8 @@ def main(
     original_post_context: str,
     model: str, # "claude-3-sonnet-20240229" from config
     system_prompt: str, # From config
-    anthropic_api_key: str # Secret
+    anthropic_api_key: str, # Secret
+    regenerate: bool = False
 ) -> Dict:
     """
     Generates a draft reply to a user comment for approval.
@@ -24,38 +79,17 @@ def main(
         model: The LLM to use for the reply.
         system_prompt: The persona for the AI assistant.
         anthropic_api_key: The API key for Anthropic.
+        regenerate: Ask the model again instead of returning the cached reply.
 
     Returns:
         A dictionary with the suggested reply.
     """
     print(f"[Comment Engine] Generating reply for '{comment_author}'")
 
-    client = Anthropic(api_key=anthropic_api_key)
-
-    user_prompt = f"""
-    A user named '{comment_author}' left the following comment on our post.
-    
-    **Our Original Post's Content:**
-    ---
-    {original_post_context}
-    ---
-
-    **Their Comment:**
-    ---
-    {comment_text}
-    ---
-    
-    Please draft a reply based on your system instructions.
-    """
-
     try:
-        message = client.messages.create(
-            model=model,
-            max_tokens=500,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
-        )
-        suggested_reply = message.content[0].text
+        client = get_client(anthropic_api_key)
+        suggested_reply = generate_reply(client, model, build_system(system_prompt, original_post_context),
+                                         comment_text, comment_author, regenerate)
         
         print("[Comment Engine] Successfully generated draft reply.")
         return {
@@ -66,3 +100,57 @@ def main(
     except Exception as e:
         print(f"[Comment Engine] Error: {e}")
         return {"status": "error", "message": str(e)}
+
+# --- Batch Entry Point ---
+def main_batch(
+    comments: List[Dict[str, Any]], # [{"comment_text", "comment_author", optional "comment_id"}]
+    original_post_context: str,
+    model: str,
+    system_prompt: str,
+    anthropic_api_key: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> Dict:
+    """
+    Drafts replies to many comments on the same post in one job.
+
+    Args:
+        comments: The comments to answer, each with comment_text and comment_author.
+        original_post_context: The text of the post they commented on.
+        model: The LLM to use for the replies.
+        system_prompt: The persona for the AI assistant.
+        anthropic_api_key: The API key for Anthropic.
+        max_concurrency: How many replies are generated at once.
+
+    Returns:
+        One result per comment, in input order. A failed comment gets an error entry
+        and does not affect the others.
+    """
+    print(f"[Comment Engine] Generating replies for {len(comments)} comment(s)")
+    if not comments:
+        return {"status": "success", "replies": [], "model_used": model}
+
+    client = get_client(anthropic_api_key)
+    system = build_system(system_prompt, original_post_context)
+
+    def reply(comment: Dict[str, Any]) -> Dict[str, Any]:
+        result = {"comment_id": comment.get("comment_id"), "comment_author": comment.get("comment_author")}
+        try:
+            result["suggested_reply"] = generate_reply(client, model, system, comment["comment_text"], comment["comment_author"])
+            result["status"] = "success"
+        except Exception as e:
+            print(f"[Comment Engine] Error for '{comment.get('comment_author')}': {e}")
+            result.update(status="error", message=str(e))
+        return result
+
+    # The first reply runs alone so it writes the prompt cache before the rest read it
+    replies = [reply(comments[0])]
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        replies.extend(pool.map(reply, comments[1:]))
+
+    failed = sum(1 for r in replies if r["status"] == "error")
+    print(f"[Comment Engine] Drafted {len(replies) - failed} reply(ies), {failed} failed.")
+    return {
+        "status": "success" if not failed else ("error" if failed == len(replies) else "partial"),
+        "replies": replies,
+        "model_used": model
+    }
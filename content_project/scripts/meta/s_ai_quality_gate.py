@@ -2,7 +2,8 @@
 
 import os
 import json
-import requests
+import s_http_client as http_client
+from s_llm_cache import cached_completion
 from typing import Dict, Any
 
 # --- Configuration ---
@@ -39,11 +40,15 @@ def run_quality_check(text_to_review: str, brand_guidelines: str) -> Dict[str, A
     payload = {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": {"response_mime_type": "application/json"}}
     headers = {"Content-Type": "application/json"}
     
-    try:
-        response = requests.post(GEMINI_API_URL, headers=headers, data=json.dumps(payload))
+    def evaluate() -> Dict[str, Any]:
+        response = http_client.post(GEMINI_API_URL, headers=headers, data=json.dumps(payload),
+                                   timeout=http_client.LONG_TIMEOUT, idempotent=True)
         response.raise_for_status()
-        result_text = response.json()['candidates'][0]['content']['parts'][0]['text']
-        evaluation = json.loads(result_text)
+        return json.loads(response.json()['candidates'][0]['content']['parts'][0]['text'])
+
+    try:
+        # Re-reviewing an unchanged draft returns the earlier verdict
+        evaluation = cached_completion("gemini", "gemini-pro", None, prompt, payload["generationConfig"], evaluate)
         print(f"Quality Gate decision: {evaluation.get('decision')}. Reason: {evaluation.get('reason')}")
         return {"status": "success", **evaluation}
     except Exception as e:
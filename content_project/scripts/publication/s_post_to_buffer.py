@@ -7,9 +7,68 @@
 # 3. In Windmill, store the token as a secret (e.g., `BUFFER_ACCESS_TOKEN`).
 # 4. You will also need the Profile IDs for the accounts you want to post to.
 #    You can get these from the `user.json` endpoint of the Buffer API.
+#
+# main_batch schedules many posts in one job through a local queue: items are
+# persisted in SQLite (BUFFER_QUEUE_PATH) before anything is sent, sends are paced
+# by a token bucket under Buffer's per-token rate limit, a 429 pauses the whole queue
+# for its Retry-After, and whatever is still pending when the job stops is picked
+# up again by the next run.
+# create.json is not idempotent, so a post is only resent when Buffer cannot have
+# created it: after a 429 or a failure to connect. Each item is claimed ('sending',
+# with a lease) right before its request, so overlapping runs never send it twice. A
+# request whose outcome is unclear (5xx, read timeout, dropped connection, expired
+# lease) leaves the item 'unknown' for a human to check instead of risking a repost.
 
+import os, json, time, sqlite3, hashlib, threading
 import requests
-from typing import List, Dict, Any
+from urllib3.exceptions import NewConnectionError
+import s_http_client as http_client
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+from s_rate_limit import TokenBucket
+
+API_URL = "https://api.bufferapp.com/1/updates/create.json"
+QUEUE_PATH = os.environ.get("BUFFER_QUEUE_PATH", os.path.join("/tmp", "buffer_queue.sqlite3"))
+# Buffer allows 60 authenticated requests per minute per access token
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_BURST = 10
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_MAX_CONCURRENCY = 4
+# Longer than any single request can take (connect + read timeout)
+CLAIM_LEASE_SECONDS = 120
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buffer_queue (
+    item_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending, sending, sent, failed, unknown
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    last_error TEXT,
+    update_ids TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_buffer_queue_status ON buffer_queue(status, created_at);
+"""
+
+def build_payload(profile_ids: List[str], post_text: str, media_url: Optional[str] = None,
+                  post_now: bool = False, scheduled_at: Optional[str] = None) -> Dict[str, Any]:
+    data = {
+        "text": post_text,
+        "profile_ids[]": profile_ids,
+        "now": "true" if post_now else "false",
+        "shorten": "false", # Usually better to handle links manually
+    }
+    
+    # Add media if a URL is provided
+    if media_url:
+        data["media[link]"] = media_url
+        data["media[photo]"] = media_url # Often the same for simple images
+    if scheduled_at:
+        data["scheduled_at"] = scheduled_at
+    return data
 
 # --- Main Function ---
 def main(
@@ -38,27 +97,14 @@ def main(
     print(f"Creating Buffer post for {len(profile_ids)} profile(s).")
     
     # --- Step 1: Prepare the API request payload ---
-    api_url = "https://api.bufferapp.com/1/updates/create.json"
-    
     headers = {
         "Authorization": f"Bearer {buffer_access_token}"
     }
-    
-    data = {
-        "text": post_text,
-        "profile_ids[]": profile_ids,
-        "now": "true" if post_now else "false",
-        "shorten": "false", # Usually better to handle links manually
-    }
-    
-    # Add media if a URL is provided
-    if media_url:
-        data["media[link]"] = media_url
-        data["media[photo]"] = media_url # Often the same for simple images
+    data = build_payload(profile_ids, post_text, media_url, post_now)
         
     # --- Step 2: Make the POST request to Buffer's API ---
     try:
-        response = requests.post(api_url, headers=headers, data=data)
+        response = http_client.post(API_URL, headers=headers, data=data)
         response.raise_for_status() # Raise an exception for non-2xx status codes
         
         response_data = response.json()
@@ -82,6 +128,206 @@ def main(
         print(f"A network error occurred: {e}")
         return {"status": "error", "message": str(e)}
 
+# --- Publishing Queue ---
+_queue_ready = set()
+_queue_lock = threading.Lock()
+
+@contextmanager
+def _queue_db(path: str = QUEUE_PATH):
+    if path not in _queue_ready: os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if path not in _queue_ready:
+            with _queue_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(QUEUE_SCHEMA)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(buffer_queue)")}
+                if "lease_until" not in columns: conn.execute("ALTER TABLE buffer_queue ADD COLUMN lease_until REAL")
+                _queue_ready.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def item_id_for(post: Dict[str, Any]) -> str:
+    """The post's own item_id, or a hash of its content so a re-submitted batch is not posted twice."""
+    if post.get("item_id"): return str(post["item_id"])
+    key = [sorted(post["profile_ids"]), post["post_text"], post.get("media_url"), post.get("post_now", False), post.get("scheduled_at")]
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()[:16]
+
+def enqueue(posts: List[Dict[str, Any]]) -> List[str]:
+    """Persists the posts as pending items; items already queued keep their status. Returns the item ids in order."""
+    now = time.time()
+    ids = [item_id_for(p) for p in posts]
+    with _queue_db() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO buffer_queue (item_id, payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            [(item_id, json.dumps(build_payload(p["profile_ids"], p["post_text"], p.get("media_url"),
+                                                p.get("post_now", False), p.get("scheduled_at"))), now, now)
+             for item_id, p in zip(ids, posts)]
+        )
+    return ids
+
+def _mark(item_id: str, status: str, error: Optional[str] = None, update_ids: Optional[List[str]] = None):
+    with _queue_db() as conn:
+        conn.execute(
+            "UPDATE buffer_queue SET status = ?, last_error = ?, update_ids = COALESCE(?, update_ids), "
+            "lease_until = NULL, updated_at = ? WHERE item_id = ?",
+            (status, error, json.dumps(update_ids) if update_ids is not None else None, time.time(), item_id)
+        )
+
+def _claim(item_id: str) -> bool:
+    """Takes a pending item for one send attempt; False if another run has it or it is no longer pending."""
+    now = time.time()
+    with _queue_db() as conn:
+        return conn.execute(
+            "UPDATE buffer_queue SET status = 'sending', lease_until = ?, attempts = attempts + 1, updated_at = ? "
+            "WHERE item_id = ? AND status = 'pending'",
+            (now + CLAIM_LEASE_SECONDS, now, item_id)
+        ).rowcount == 1
+
+def _expire_claims() -> int:
+    """Items whose sender died mid-request may or may not exist in Buffer: park them as 'unknown'."""
+    with _queue_db() as conn:
+        return conn.execute(
+            "UPDATE buffer_queue SET status = 'unknown', last_error = 'Interrupted while sending.', lease_until = NULL "
+            "WHERE status = 'sending' AND lease_until < ?",
+            (time.time(),)
+        ).rowcount
+
+def _never_sent(e: requests.exceptions.RequestException) -> bool:
+    """True only when the request provably never reached Buffer (no connection was made)."""
+    if isinstance(e, requests.exceptions.ConnectTimeout): return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(e, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+def _items(where: str, params: tuple) -> List[Dict[str, Any]]:
+    with _queue_db() as conn:
+        rows = conn.execute(
+            f"SELECT item_id, payload, status, attempts, last_error, update_ids FROM buffer_queue WHERE {where} ORDER BY created_at",
+            params
+        ).fetchall()
+    return [{"item_id": r[0], "payload": json.loads(r[1]), "status": r[2], "attempts": r[3],
+             "message": r[4], "update_ids": json.loads(r[5]) if r[5] else None} for r in rows]
+
+class _Pause:
+    """Queue-wide pause after a 429, so no worker keeps hitting a rate-limited token."""
+    def __init__(self):
+        self.until = 0.0
+        self.lock = threading.Lock()
+
+    def extend(self, seconds: float):
+        with self.lock:
+            self.until = max(self.until, time.monotonic() + seconds)
+
+    def wait(self):
+        while True:
+            remaining = self.until - time.monotonic()
+            if remaining <= 0: return
+            time.sleep(remaining)
+
+def main_batch(
+    buffer_access_token: str, # Secret from Windmill
+    posts: List[Dict[str, Any]], # [{"profile_ids", "post_text", optional "media_url", "post_now", "scheduled_at", "item_id"}]
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    time_budget_seconds: float = 600,
+    retry_failed: bool = False
+) -> Dict[str, Any]:
+    """
+    Schedules many posts across profiles through the persistent Buffer queue.
+
+    Args:
+        buffer_access_token: Your Buffer API access token.
+        posts: The posts to schedule. Items left pending by earlier runs are sent too.
+        requests_per_minute: Sustained send rate, kept under Buffer's limit.
+        max_attempts: Sends per item (429s and connection failures) before it is marked failed.
+        max_concurrency: How many requests are in flight at once.
+        time_budget_seconds: Stop sending after this long; unsent items stay pending for the next run.
+        retry_failed: Put 'failed' and 'unknown' items back into the queue. Check Buffer for the
+            'unknown' ones first: they may already have been posted.
+
+    Returns:
+        Counts per status plus one result per item: the submitted posts in input order,
+        followed by any resumed items.
+    """
+    ids = enqueue(posts)
+    interrupted = _expire_claims()
+    if interrupted:
+        print(f"{interrupted} Buffer post(s) were interrupted mid-send by an earlier run and are marked unknown.")
+    if retry_failed:
+        with _queue_db() as conn:
+            conn.execute("UPDATE buffer_queue SET status = 'pending', attempts = 0 WHERE status IN ('failed', 'unknown')")
+    pending = _items("status = 'pending'", ())
+    print(f"Sending {len(pending)} queued Buffer post(s).")
+
+    headers = {"Authorization": f"Bearer {buffer_access_token}"}
+    bucket = TokenBucket(requests_per_minute / 60.0, capacity=DEFAULT_BURST)
+    pause = _Pause()
+    deadline = time.monotonic() + time_budget_seconds
+
+    def send(item: Dict[str, Any]):
+        item_id, attempt = item["item_id"], item["attempts"]
+        while True:
+            if attempt >= max_attempts:
+                _mark(item_id, "failed", f"Gave up after {attempt} attempt(s).")
+                return
+            pause.wait()
+            if time.monotonic() >= deadline or not bucket.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                return # Stays pending for the next run
+            if not _claim(item_id): return
+            attempt += 1
+            try:
+                # Retries are driven here so a 429 pauses every worker, not just this one
+                response = http_client.post(API_URL, headers=headers, data=item["payload"], retries=0)
+            except requests.exceptions.RequestException as e:
+                if _never_sent(e):
+                    _mark(item_id, "pending", str(e))
+                    time.sleep(http_client.backoff_seconds(attempt))
+                    continue
+                _mark(item_id, "unknown", f"Outcome unknown, check Buffer before retrying: {e}")
+                return
+            if response.status_code == 429:
+                # Refused before processing: safe to send again
+                wait = http_client.retry_after_seconds(response)
+                pause.extend(wait if wait is not None else http_client.backoff_seconds(attempt, base=5.0))
+                print("Buffer rate limit hit, pausing the queue.")
+                _mark(item_id, "pending", "HTTP 429")
+                continue
+            if response.status_code >= 500:
+                _mark(item_id, "unknown", f"Outcome unknown, check Buffer before retrying: HTTP {response.status_code}")
+                return
+            try:
+                response_data = response.json()
+            except ValueError:
+                response_data = {}
+            if response.ok and response_data.get("success"):
+                _mark(item_id, "sent", None, [u.get("id") for u in response_data.get("updates", [])])
+            else:
+                # Rejected content or profile: sending it again will not help
+                error_message = response_data.get("message") or f"HTTP {response.status_code}"
+                print(f"Buffer rejected item {item_id}: {error_message}")
+                _mark(item_id, "failed", error_message)
+            return
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        list(pool.map(send, pending))
+
+    submitted = set(ids)
+    by_id = {i["item_id"]: i for i in _items("item_id IN (SELECT value FROM json_each(?)) OR status = 'pending'",
+                                                  (json.dumps(ids + [i["item_id"] for i in pending]),))}
+    items = [by_id[i] for i in dict.fromkeys(ids)] + [i for k, i in by_id.items() if k not in submitted]
+    results = [{k: v for k, v in i.items() if k != "payload"} for i in items]
+    summary = {status: sum(1 for r in results if r["status"] == status) for status in ("sent", "pending", "sending", "failed", "unknown")}
+    print(f"Buffer queue: {summary['sent']} sent, {summary['pending']} pending, {summary['failed']} failed, "
+          f"{summary['unknown']} unknown.")
+    return {
+        "status": "success" if summary["sent"] == len(results) else ("error" if summary["failed"] == len(results) else "partial"),
+        "summary": summary,
+        "items": results
+    }
+
 # Example of how this might be called:
 # main(
 #     buffer_access_token="1/abcd...",
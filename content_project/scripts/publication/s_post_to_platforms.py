@@ -1,28 +1,226 @@
 # /outputs/post_to_platforms.py
 
+import os
 import time
 import json
-from typing import Dict, Any
+import threading
+from concurrent.futures import Future, wait
+from typing import Dict, Any, Callable, Iterator, List, Optional
+import requests
+import s_http_client as http_client
 
-# This script simulates posting to social media APIs.
+# This script posts to social media APIs.
 # Each platform (YouTube, TikTok, Instagram) has its own complex API for uploads.
-# This script uses mock functions to represent those interactions.
+# When a platform's access token secret is not set, its upload is simulated.
+#
+# Publishers register themselves with @publisher and w_main uploads to every target
+# platform at once, so publishing takes as long as the slowest platform rather than
+# the sum of all of them. Each platform has its own timeout and a failure on one does
+# not affect the others.
+#
+# Videos go through the platforms' resumable upload sessions: the file is relayed in
+# chunks as it downloads, never held in memory whole, and nothing is published until
+# the final chunk arrives. That gives two guarantees:
+# - Opening the session publishes nothing, so a session request that failed is raised
+#   as RetryablePublishError and retried. Any failure after that is reported at once
+#   instead of risking a double post.
+# - At the platform's deadline the upload stops before its next chunk. A platform still
+#   uploading at its deadline is reported as "unknown": if the final chunk was already
+#   in flight the post may still appear, so check the platform before posting again.
 
-def post_to_youtube(draft: Dict[str, Any]) -> Dict[str, Any]:
-    """Simulates uploading a video to YouTube."""
-    print(f"POSTING to YouTube: '{draft['title']}'")
+DEFAULT_TIMEOUT_SECONDS = 600.0
+DEFAULT_RETRIES = 2
+CHUNK_SIZE = 8 * 1024 * 1024  # Multiple of 256 KiB, as YouTube requires; within TikTok's 5-64 MB range
+CHUNK_STATUSES = (200, 201, 206, 308)  # 206/308 mean "received, send the next chunk"
+YOUTUBE_UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
+TIKTOK_INIT_URL = "https://open.tiktokapis.com/v2/post/publish/video/init/"
+
+PUBLISHERS: Dict[str, Dict[str, Any]] = {}
+
+class RetryablePublishError(Exception):
+    """Raised by a publisher when the platform refused the request without creating the post."""
+
+class UploadCancelled(Exception):
+    """The deadline passed before the final chunk was sent, so nothing was published."""
+
+def publisher(platform: str, timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS, retries: int = DEFAULT_RETRIES):
+    """
+    Registers the decorated function as the uploader for `platform`. It is called with
+    the draft and its monotonic deadline; `retries` applies to RetryablePublishError only.
+    """
+    def register(func: Callable[[Dict[str, Any], float], Dict[str, Any]]):
+        PUBLISHERS[platform] = {"func": func, "timeout_seconds": timeout_seconds, "retries": retries}
+        return func
+    return register
+
+def open_upload_session(method: str, url: str, **kwargs) -> requests.Response:
+    """Sends the request that creates an upload session; failures are retryable since no post exists yet."""
+    try:
+        res = http_client.request(method, url, retries=0, idempotent=False, **kwargs)
+    except requests.exceptions.RequestException as e:
+        raise RetryablePublishError(f"Upload session not created: {e}") from e
+    if res.status_code == 429 or res.status_code >= 500:
+        raise RetryablePublishError(f"Upload session not created: HTTP {res.status_code}")
+    res.raise_for_status()
+    return res
+
+def media_size(media_url: str) -> int:
+    res = http_client.request("HEAD", media_url, allow_redirects=True)
+    res.raise_for_status()
+    if "Content-Length" not in res.headers: raise ValueError(f"{media_url} does not report its size.")
+    return int(res.headers["Content-Length"])
+
+def stream_media(media_url: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yields the media file in pieces as it downloads, never holding the whole file in memory."""
+    res = http_client.get(media_url, stream=True, timeout=http_client.LONG_TIMEOUT)
+    try:
+        res.raise_for_status()
+        for piece in res.iter_content(chunk_size=chunk_size):
+            if piece: yield piece
+    finally:
+        res.close()
+
+def upload_chunks(upload_url: str, media_url: str, total_size: int, deadline: float, chunk_size: int = CHUNK_SIZE,
+                  total_chunks: Optional[int] = None, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    """
+    Relays `media_url` to a resumable upload session, one Content-Range PUT per chunk,
+    and returns the platform's response to the final chunk.
+
+    `total_chunks` fixes the chunk count for platforms that want the remainder folded
+    into the last chunk (TikTok); by default the last chunk is whatever is left.
+    Raises UploadCancelled once `deadline` passes, and IOError if the download does not
+    match `total_size`; in both cases the final chunk was never sent.
+    """
+    if total_chunks is None: total_chunks = max(1, -(-total_size // chunk_size))
+    ends = [min(total_size, (i + 1) * chunk_size) for i in range(total_chunks - 1)] + [total_size]
+    offset, res, buffer = 0, None, bytearray()
+    pieces = stream_media(media_url)
+    for end in ends:
+        while len(buffer) < end - offset:
+            piece = next(pieces, None)
+            if piece is None:
+                raise IOError(f"Media stream ended at {offset + len(buffer)} of {total_size} bytes; upload left unfinished.")
+            buffer += piece
+        if time.monotonic() >= deadline:
+            raise UploadCancelled(f"Deadline passed after {offset} of {total_size} bytes.")
+        chunk = bytes(buffer[:end - offset])
+        del buffer[:end - offset]
+        if end == total_size and (buffer or next(pieces, None) is not None):
+            raise IOError(f"Media stream is longer than the announced {total_size} bytes; upload left unfinished.")
+        res = http_client.request(
+            "PUT", upload_url, data=chunk, idempotent=True, timeout=http_client.LONG_TIMEOUT,
+            headers={**(headers or {}), "Content-Range": f"bytes {offset}-{end - 1}/{total_size}"}
+        )
+        if res.status_code not in CHUNK_STATUSES: res.raise_for_status()
+        offset = end
+    return res
+
+def _simulate(platform: str, label: str, id_prefix: str, draft: Dict[str, Any], latency_seconds: float) -> Dict[str, Any]:
+    print(f"POSTING to {label}: '{draft['title']}'")
     print(f"Video URL: {draft['assets']['video_url']}")
-    time.sleep(5) # Simulate API call latency
+    time.sleep(latency_seconds) # Simulate API call latency
+    print(f"...{label} post successful.")
+    return {"platform": platform, "status": "success", "post_id": f"{id_prefix}_{int(time.time())}"}
+
+@publisher("youtube", timeout_seconds=900)
+def post_to_youtube(draft: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+    """Uploads the draft's video to YouTube through a resumable upload session."""
+    token = os.environ.get("WMILL_SECRET_YOUTUBE_ACCESS_TOKEN")
+    if not token: return _simulate("youtube", "YouTube", "yt", draft, 5)
+    video_url = draft["assets"]["video_url"]
+    size = media_size(video_url)
+    auth = {"Authorization": f"Bearer {token}"}
+    session = open_upload_session(
+        "POST", YOUTUBE_UPLOAD_URL, params={"uploadType": "resumable", "part": "snippet,status"},
+        headers={**auth, "X-Upload-Content-Length": str(size), "X-Upload-Content-Type": "video/*"},
+        json={"snippet": {"title": draft["title"], "description": draft.get("description", "")},
+              "status": {"privacyStatus": draft.get("privacy_status", "public")}}
+    )
+    res = upload_chunks(session.headers["Location"], video_url, size, deadline, headers=auth)
     print("...YouTube post successful.")
-    return {"platform": "youtube", "status": "success", "post_id": f"yt_{int(time.time())}"}
+    return {"platform": "youtube", "status": "success", "post_id": res.json()["id"]}
 
-def post_to_tiktok(draft: Dict[str, Any]) -> Dict[str, Any]:
-    """Simulates uploading a video to TikTok."""
-    print(f"POSTING to TikTok: '{draft['title']}'")
-    print(f"Video URL: {draft['assets']['video_url']}")
-    time.sleep(3) # Simulate API call latency
+@publisher("tiktok", timeout_seconds=600)
+def post_to_tiktok(draft: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+    """Uploads the draft's video to TikTok through the Content Posting API's chunked upload."""
+    token = os.environ.get("WMILL_SECRET_TIKTOK_ACCESS_TOKEN")
+    if not token: return _simulate("tiktok", "TikTok", "tt", draft, 3)
+    video_url = draft["assets"]["video_url"]
+    size = media_size(video_url)
+    # TikTok folds the remainder into the last chunk; a video under one chunk goes up whole
+    chunk_size = min(CHUNK_SIZE, size)
+    total_chunks = size // chunk_size
+    session = open_upload_session(
+        "POST", TIKTOK_INIT_URL, headers={"Authorization": f"Bearer {token}"},
+        json={"post_info": {"title": draft["title"], "privacy_level": draft.get("privacy_level", "SELF_ONLY")},
+              "source_info": {"source": "FILE_UPLOAD", "video_size": size, "chunk_size": chunk_size,
+                              "total_chunk_count": total_chunks}}
+    )
+    data = session.json()["data"]
+    upload_chunks(data["upload_url"], video_url, size, deadline, chunk_size, total_chunks,
+                  headers={"Content-Type": "video/mp4"})
     print("...TikTok post successful.")
-    return {"platform": "tiktok", "status": "success", "post_id": f"tt_{int(time.time())}"}
+    return {"platform": "tiktok", "status": "success", "post_id": data["publish_id"]}
+
+def publish(platform: str, draft: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+    """Runs one platform's publisher, retrying retryable failures while its deadline allows."""
+    entry = PUBLISHERS[platform]
+    attempt = 0
+    while True:
+        try:
+            return entry["func"](draft, deadline)
+        except RetryablePublishError as e:
+            wait_seconds = http_client.backoff_seconds(attempt, base=2.0)
+            if attempt >= entry["retries"] or time.monotonic() + wait_seconds >= deadline: raise
+            print(f"ERROR: [Publisher] {platform} attempt {attempt + 1} failed, retrying in {wait_seconds:.1f}s. Error: {e}")
+            time.sleep(wait_seconds)
+            attempt += 1
+
+def _run_detached(func: Callable[..., Any], *args) -> Future:
+    """Runs func on a daemon thread, so an upload that overran its timeout does not hold the job open."""
+    future: Future = Future()
+    future.set_running_or_notify_cancel()
+
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def publish_all(draft: Dict[str, Any], platforms: List[str]) -> List[Dict[str, Any]]:
+    """
+    Publishes to every platform concurrently; one result per platform, in the order given.
+    A platform still uploading at its deadline gets status "unknown" rather than "error".
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for platform in platforms:
+        if platform not in PUBLISHERS:
+            results[platform] = {"platform": platform, "status": "error", "message": "No publisher registered."}
+    targets = [p for p in platforms if p in PUBLISHERS]
+    if targets:
+        started = time.monotonic()
+        futures = {p: _run_detached(publish, p, draft, started + PUBLISHERS[p]["timeout_seconds"]) for p in targets}
+        for platform in sorted(targets, key=lambda p: PUBLISHERS[p]["timeout_seconds"]):
+            future = futures[platform]
+            wait([future], timeout=max(0.0, started + PUBLISHERS[platform]["timeout_seconds"] - time.monotonic()))
+            if not future.done():
+                # The upload stops before its next chunk, but one already in flight may be the final one
+                print(f"ERROR: [Publisher] {platform} still uploading at its deadline; outcome unknown.")
+                results[platform] = {"platform": platform, "status": "unknown",
+                                     "message": f"Still uploading after {PUBLISHERS[platform]['timeout_seconds']}s. "
+                                                "Check the platform before posting again."}
+                continue
+            try:
+                results[platform] = future.result()
+            except UploadCancelled as e:
+                print(f"ERROR: [Publisher] {platform} cancelled at its deadline, nothing was published. Error: {e}")
+                results[platform] = {"platform": platform, "status": "error", "message": f"Cancelled: {e}"}
+            except Exception as e:
+                print(f"ERROR: [Publisher] {platform} failed. Error: {e}")
+                results[platform] = {"platform": platform, "status": "error", "message": str(e)}
+    return [results[p] for p in dict.fromkeys(platforms)]
 
 def w_main(draft: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -32,7 +230,9 @@ def w_main(draft: Dict[str, Any]) -> Dict[str, Any]:
         draft: The approved draft object.
 
     Returns:
-        A dictionary with the results of the posting operations.
+        A dictionary with the results of the posting operations. The status is
+        "partial" when some platforms failed and others succeeded, or when any
+        platform's outcome is "unknown" (see publish_all).
     """
     print(f"Initiating posting for draft ID: {draft.get('draft_id')}")
 
@@ -41,13 +241,9 @@ def w_main(draft: Dict[str, Any]) -> Dict[str, Any]:
         return {"status": "error", "message": "Draft is not approved for posting."}
 
     target_platforms = draft.get("platforms", [])
-    results = []
-
-    if "youtube" in target_platforms:
-        results.append(post_to_youtube(draft))
-
-    if "tiktok" in target_platforms:
-        results.append(post_to_tiktok(draft))
+    results = publish_all(draft, target_platforms)
+    failed = sum(1 for r in results if r.get("status") == "error")
+    succeeded = sum(1 for r in results if r.get("status") == "success")
 
     # After posting, we could log this success to Google Sheets
     # For example, call the /meta/log_to_google_sheets.py script here.
@@ -55,7 +251,7 @@ def w_main(draft: Dict[str, Any]) -> Dict[str, Any]:
     # call_windmill_script("/meta/log_to_google_sheets", {"log_data": log_data})
 
     return {
-        "status": "success",
+        "status": "success" if succeeded == len(results) else ("error" if failed == len(results) else "partial"),
         "draft_id": draft.get('draft_id'),
         "posting_results": results
     }
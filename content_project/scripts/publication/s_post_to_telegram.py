@@ -8,6 +8,7 @@
 #    private chat, you may need a tool like @userinfobot.
 
 import requests
+import s_http_client as http_client
 from typing import Dict, Any
 
 # This script uses the simple `requests` library to avoid a large dependency
@@ -54,7 +55,7 @@ def main(
     url = f"https://api.telegram.org/bot{bot_token}/{api_method}"
     
     try:
-        response = requests.post(url, data=payload)
+        response = http_client.post(url, data=payload)
         response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
         
         response_data = response.json()
@@ -1,7 +1,7 @@
 # File: s_request_approval.py
 # This script sends a message to your content channel asking for approval.
 import os
-import requests
+import s_http_client as http_client
 
 def main(content_draft: dict) -> dict:
     print("INFO: [Content-Approval] Sending draft for human approval.")
@@ -27,7 +27,7 @@ def main(content_draft: dict) -> dict:
     payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
 
     try:
-        res = requests.post(url, json=payload, timeout=10)
+        res = http_client.post(url, json=payload, timeout=10)
         res.raise_for_status()
         print("INFO: [Content-Approval] Approval request sent successfully.")
         return {"status": "approval_sent"}
@@ -1,4 +1,5 @@
-import os, requests, json
+import os, json
+import s_http_client as http_client
 from typing import Dict, Any
 
 def main(region_code: str = "US", video_category_id: str = "28") -> Dict[str, Any]:
@@ -13,7 +14,8 @@ def main(region_code: str = "US", video_category_id: str = "28") -> Dict[str, An
         "maxResults": 15, "key": api_key,
     }
     try:
-        response = requests.get("https://www.googleapis.com/youtube/v3/videos", params=params)
+        # The chart changes slowly; a 304 against the stored ETag costs no quota for the body
+        response = http_client.get("https://www.googleapis.com/youtube/v3/videos", params=params, cache=True)
         response.raise_for_status()
         data = response.json()
         videos = [
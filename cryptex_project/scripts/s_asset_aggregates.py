@@ -0,0 +1,88 @@
+# Rolling per-asset context read from the minute buckets that the insert triggers
+# on recent_trades/recent_catalysts keep up to date (see s_db_init.sql).
+# Every window is answered from at most 1440 primary-key rows per asset, never from
+# raw_data, so the correlation engine and the alerter can ask on every tick.
+# Windows have minute resolution: "5m" is the current minute's bucket and the four before it.
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+WINDOWS = {"5m": 5, "1h": 60, "24h": 1440}
+RETENTION_MINUTES = max(WINDOWS.values())
+
+def _windowed(aggregate: str, minutes: int, condition: str = "") -> str:
+    # A window of N minutes is the current minute's bucket plus the N - 1 before it
+    return f"{aggregate} FILTER (WHERE {condition}minute > %(as_of)s::timestamptz - INTERVAL '{minutes} minutes')"
+
+STATS_QUERY = """
+SELECT asset, """ + ",\n".join(
+    f"{_windowed('SUM(trade_count)', m)}, {_windowed('SUM(long_notional_usd)', m)}, "
+    f"{_windowed('SUM(short_notional_usd)', m)}, {_windowed('SUM(catalyst_count)', m)}"
+    for m in WINDOWS.values()
+) + f"""
+FROM public.asset_minute_stats
+WHERE asset = ANY(%(assets)s::text[])
+AND minute > %(as_of)s::timestamptz - INTERVAL '{RETENTION_MINUTES} minutes' AND minute <= %(as_of)s::timestamptz
+GROUP BY asset;
+"""
+
+LONG_SIDE, SHORT_SIDE = "side = 'LONG' AND ", "side = 'SHORT' AND "
+
+TRADERS_QUERY = """
+SELECT asset, """ + ",\n".join(
+    f"{_windowed('COUNT(DISTINCT trader_id)', m)}, "
+    f"{_windowed('COUNT(DISTINCT trader_id)', m, LONG_SIDE)}, "
+    f"{_windowed('COUNT(DISTINCT trader_id)', m, SHORT_SIDE)}"
+    for m in WINDOWS.values()
+) + f"""
+FROM public.asset_minute_traders
+WHERE asset = ANY(%(assets)s::text[])
+AND minute > %(as_of)s::timestamptz - INTERVAL '{RETENTION_MINUTES} minutes' AND minute <= %(as_of)s::timestamptz
+GROUP BY asset;
+"""
+
+def empty_window() -> Dict[str, Any]:
+    return {"trade_count": 0, "distinct_traders": 0, "long_traders": 0, "short_traders": 0,
+            "long_notional_usd": 0.0, "short_notional_usd": 0.0, "net_notional_usd": 0.0, "catalyst_count": 0}
+
+def get_rolling_aggregates(cur, assets: List[str], as_of: Optional[datetime] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Returns asset -> window ("5m", "1h", "24h") -> aggregates, for every requested asset.
+
+    Aggregates are trade_count, distinct_traders, long_traders, short_traders,
+    long_notional_usd, short_notional_usd, net_notional_usd and catalyst_count.
+    Windows end now, or at `as_of` when replaying history.
+    """
+    result = {asset: {name: empty_window() for name in WINDOWS} for asset in assets}
+    if not assets: return result
+    # Windows end at the bucket of the current minute, so `as_of` is truncated to it
+    as_of = (as_of or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+    params = {"assets": list(assets), "as_of": as_of}
+
+    cur.execute(STATS_QUERY, params)
+    for asset, *values in cur.fetchall():
+        for i, name in enumerate(WINDOWS):
+            trades, long_usd, short_usd, catalysts = values[i * 4:i * 4 + 4]
+            window = result[asset][name]
+            window["trade_count"] = int(trades or 0)
+            window["long_notional_usd"] = float(long_usd or 0)
+            window["short_notional_usd"] = float(short_usd or 0)
+            window["net_notional_usd"] = window["long_notional_usd"] - window["short_notional_usd"]
+            window["catalyst_count"] = int(catalysts or 0)
+
+    cur.execute(TRADERS_QUERY, params)
+    for asset, *values in cur.fetchall():
+        for i, name in enumerate(WINDOWS):
+            distinct, long_traders, short_traders = values[i * 3:i * 3 + 3]
+            window = result[asset][name]
+            window["distinct_traders"] = int(distinct or 0)
+            window["long_traders"] = int(long_traders or 0)
+            window["short_traders"] = int(short_traders or 0)
+    return result
+
+def prune_aggregates(cur, now: datetime, retention_minutes: int = RETENTION_MINUTES + 60) -> int:
+    """Deletes minute buckets older than the longest window plus a margin."""
+    cutoff = now - timedelta(minutes=retention_minutes)
+    cur.execute("DELETE FROM public.asset_minute_stats WHERE minute < %s", (cutoff,))
+    pruned = cur.rowcount
+    cur.execute("DELETE FROM public.asset_minute_traders WHERE minute < %s", (cutoff,))
+    return pruned + cur.rowcount
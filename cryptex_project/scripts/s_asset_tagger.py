@@ -0,0 +1,106 @@
+# Tags news text with the assets it mentions.
+# The symbol/alias dictionary is compiled once into an Aho-Corasick automaton, so a
+# whole batch of headlines and descriptions is tagged in a single pass over the text
+# regardless of how many symbols are configured.
+import os
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import yaml
+
+DEFAULT_ALIASES_PATH = os.environ.get(
+    "CRYPTEX_ASSET_ALIASES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "asset_aliases.yaml")
+)
+
+# How strongly each kind of mention ties a text to an asset
+MATCH_STRENGTH = {"cashtag": 1.0, "ticker": 0.8, "alias": 0.6}
+BATCH_SEPARATOR = "\n\x00\n"
+
+def _lower(text: str) -> str:
+    # Per-character lowering keeps offsets aligned with the original text
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+class AssetTagger:
+    def __init__(self, assets: Dict[str, Dict[str, Iterable[str]]]):
+        """`assets` maps an asset symbol to {"tickers": [...], "aliases": [...]}."""
+        # Trie as parallel lists: goto transitions, failure links, outputs per state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, str]]] = [[]]
+        for asset, entry in assets.items():
+            for ticker in entry.get("tickers") or []:
+                self._add(ticker, (asset, "ticker", ticker))
+                self._add(f"${ticker}", (asset, "cashtag", f"${ticker}"))
+            for alias in entry.get("aliases") or []:
+                self._add(alias, (asset, "alias", alias))
+        self._build()
+
+    def _add(self, pattern: str, output: Tuple[str, str, str]):
+        state = 0
+        for c in _lower(pattern):
+            nxt = self._goto[state].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(output)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(c, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _scan(self, text: str):
+        """Yields (start, asset, strength) for every whole-word match in `text`."""
+        lowered = _lower(text)
+        state = 0
+        for end, c in enumerate(lowered, 1):
+            while state and c not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(c, 0)
+            for asset, kind, pattern in self._out[state]:
+                start = end - len(pattern)
+                if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "$"): continue
+                if end < len(text) and text[end].isalnum(): continue
+                # Bare tickers must match case exactly; cashtags and names need not
+                if kind == "ticker" and text[start:end] != pattern: continue
+                yield start, asset, MATCH_STRENGTH[kind]
+
+    def tag(self, text: str) -> Dict[str, float]:
+        """Returns asset -> strongest match strength for one text."""
+        return self.tag_batch([text])[0]
+
+    def tag_batch(self, texts: List[Optional[str]]) -> List[Dict[str, float]]:
+        """Tags many texts in one pass over their concatenation; returns one asset -> strength dict per text."""
+        offsets, parts, position = [], [], 0
+        for text in texts:
+            offsets.append(position)
+            parts.append(text or "")
+            position += len(text or "") + len(BATCH_SEPARATOR)
+        results: List[Dict[str, float]] = [{} for _ in texts]
+        if not texts: return results
+        for start, asset, strength in self._scan(BATCH_SEPARATOR.join(parts)):
+            tags = results[bisect_right(offsets, start) - 1]
+            tags[asset] = max(tags.get(asset, 0.0), strength)
+        return results
+
+def load_aliases(path: str = DEFAULT_ALIASES_PATH) -> Dict[str, Dict[str, Any]]:
+    with open(path) as f:
+        return (yaml.safe_load(f) or {}).get("assets", {})
+
+@lru_cache(maxsize=None)
+def get_tagger(path: str = DEFAULT_ALIASES_PATH) -> AssetTagger:
+    """Compiles the dictionary at `path` once per process."""
+    return AssetTagger(load_aliases(path))
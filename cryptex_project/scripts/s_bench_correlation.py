@@ -0,0 +1,180 @@
+# Benchmarks the correlation query strategies against synthetic tables of growing size.
+# Data is generated server-side with generate_series into a throwaway schema whose
+# recent_trades/recent_catalysts are built from the table and index DDL in s_db_init.sql,
+# hourly partitions included, so the production tables are never touched and the plans
+# match production's. For each size and strategy the report holds p50/p99 latency and
+# the EXPLAIN (ANALYZE, BUFFERS) plan, written as JSON for run-over-run comparison.
+import os, re, json, time, random
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Callable
+from psycopg2 import sql
+from s_db import get_cursor
+from s_correlation_engine import BATCH_QUERY, PER_ASSET_QUERY, correlate_batch, correlate_per_asset
+from s_partition_maintenance import partition_name
+
+BENCH_SCHEMA = "cryptex_bench"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+INIT_SQL_PATH = os.environ.get(
+    "CRYPTEX_DB_INIT_SQL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "s_db_init.sql")
+)
+BENCH_TABLES = ("recent_trades", "recent_catalysts")
+
+# The CREATE TABLE (parents and default partitions) and CREATE INDEX statements for
+# the benchmarked tables; everything else in s_db_init.sql is left out.
+_TABLES = "|".join(BENCH_TABLES)
+TABLE_DDL_PATTERN = re.compile(r"^CREATE TABLE IF NOT EXISTS public\.(?:%s)(?:_default)?\b.*?;" % _TABLES, re.S | re.M)
+INDEX_DDL_PATTERN = re.compile(r"^CREATE INDEX IF NOT EXISTS \w+ ON public\.(?:%s)\b.*?;" % _TABLES, re.S | re.M)
+
+PARTITION_SQL = "CREATE TABLE {part} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s);"
+
+# Rows are spread uniformly over `history_hours`; asset popularity is skewed by squaring
+# a uniform draw so a few assets dominate, as on real tapes. The `WHERE g > 0` ties the
+# tag subquery to the outer row so Postgres draws fresh tags for every catalyst.
+GENERATE_TRADES_SQL = """
+INSERT INTO {schema}.recent_trades (ingested_at, trader_id, asset, raw_data)
+SELECT NOW() - random() * make_interval(hours => %(history_hours)s),
+       'trader_' || (random() * 500)::int,
+       'A' || floor(power(random(), 2) * %(assets)s)::int,
+       jsonb_build_object('direction', CASE WHEN random() < 0.5 THEN 'LONG' ELSE 'SHORT' END,
+                          'notional_usd', round((random() * 1000000)::numeric, 2))
+FROM generate_series(1, %(rows)s);
+"""
+
+GENERATE_CATALYSTS_SQL = """
+INSERT INTO {schema}.recent_catalysts (ingested_at, headline, source, asset_tags, raw_data)
+SELECT NOW() - random() * make_interval(hours => %(history_hours)s),
+       'Synthetic headline ' || g, 'bench',
+       ARRAY(SELECT DISTINCT 'A' || floor(power(random(), 2) * %(assets)s)::int
+             FROM generate_series(1, 1 + (random() * (%(max_tags)s - 1))::int) WHERE g > 0),
+       '{{}}'::jsonb
+FROM generate_series(1, %(rows)s) AS g;
+"""
+
+STRATEGIES: Dict[str, Callable] = {
+    "batch": lambda cur, assets: correlate_batch(cur, assets),
+    "per_asset": lambda cur, assets: correlate_per_asset(cur, assets),
+}
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+def load_ddl(path: str = INIT_SQL_PATH) -> Dict[str, List[str]]:
+    """Reads the production table and index DDL for the benchmarked tables, pointed at BENCH_SCHEMA."""
+    with open(path) as f:
+        init_sql = f.read()
+    retarget = lambda stmt: stmt.replace("public.", f"{BENCH_SCHEMA}.")
+    ddl = {"tables": [retarget(m.group(0)) for m in TABLE_DDL_PATTERN.finditer(init_sql)],
+           "indexes": [retarget(m.group(0)) for m in INDEX_DDL_PATTERN.finditer(init_sql)]}
+    if len(ddl["tables"]) != 2 * len(BENCH_TABLES) or not ddl["indexes"]:
+        raise ValueError(f"Could not find the recent_trades/recent_catalysts DDL in {path}.")
+    return ddl
+
+def create_hour_partitions(cur, history_hours: int):
+    """Creates the <table>_pYYYYMMDDHH partitions covering the generated history and the current hour."""
+    current_hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    for table in BENCH_TABLES:
+        for offset in range(-history_hours - 1, 2):
+            hour_start = current_hour + timedelta(hours=offset)
+            cur.execute(sql.SQL(PARTITION_SQL).format(
+                part=sql.Identifier(BENCH_SCHEMA, partition_name(table, hour_start)),
+                parent=sql.Identifier(BENCH_SCHEMA, table)), (hour_start, hour_start + timedelta(hours=1)))
+
+def populate(cur, rows: int, asset_cardinality: int, max_tags: int, catalyst_ratio: float, history_hours: int):
+    schema = sql.Identifier(BENCH_SCHEMA)
+    ddl = load_ddl()
+    cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema};").format(schema=schema))
+    for stmt in ddl["tables"]:
+        cur.execute(stmt)
+    create_hour_partitions(cur, history_hours)
+    cur.execute(sql.SQL(GENERATE_TRADES_SQL).format(schema=schema),
+                {"rows": rows, "assets": asset_cardinality, "history_hours": history_hours})
+    cur.execute(sql.SQL(GENERATE_CATALYSTS_SQL).format(schema=schema),
+                {"rows": max(1, int(rows * catalyst_ratio)), "assets": asset_cardinality,
+                 "max_tags": max_tags, "history_hours": history_hours})
+    # Indexes are built after the load, as a bulk build is faster than maintaining them row by row
+    for stmt in ddl["indexes"]:
+        cur.execute(stmt)
+    for table in BENCH_TABLES:
+        cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(BENCH_SCHEMA, table)))
+
+def explain(cur, strategy: str, assets: List[str]) -> Any:
+    prefix = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+    if strategy == "batch":
+        cur.execute(prefix + BATCH_QUERY, {"assets": assets, "as_of": None})
+    else:
+        # One representative per-asset query; the strategy runs it len(assets) times
+        cur.execute(prefix + PER_ASSET_QUERY, (assets[0], assets[0]))
+    return cur.fetchone()[0]
+
+def time_strategy(cur, strategy: str, assets: List[str], repetitions: int) -> Dict[str, Any]:
+    timings = []
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        grouped = STRATEGIES[strategy](cur, assets)
+        timings.append((time.perf_counter() - started) * 1000)
+    ordered = sorted(timings)
+    return {
+        "p50_ms": _percentile(ordered, 0.50),
+        "p99_ms": _percentile(ordered, 0.99),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "signals": sum(len(v) for v in grouped.values()),
+        "plan": explain(cur, strategy, assets),
+    }
+
+def main(sizes: List[int] = DEFAULT_SIZES, asset_cardinality: int = 200, assets_per_tick: int = 20,
+         max_tags: int = 3, catalyst_ratio: float = 0.05, history_hours: int = 24,
+         repetitions: int = 20, output_path: str = "correlation_bench.json") -> Dict[str, Any]:
+    """
+    Runs every correlation strategy at every table size and writes a JSON report.
+
+    Args:
+        sizes: recent_trades row counts to test; catalysts are `catalyst_ratio` of that.
+        asset_cardinality: Number of distinct synthetic assets.
+        assets_per_tick: How many assets each correlation call checks.
+        max_tags: Upper bound on asset_tags per catalyst.
+        catalyst_ratio: Catalysts generated per trade.
+        history_hours: Span the rows are spread over; only the last 5 minutes are "hot".
+        repetitions: Timed runs per strategy and size.
+        output_path: Where the machine-readable report is written.
+    """
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "params": {"asset_cardinality": asset_cardinality, "assets_per_tick": assets_per_tick, "max_tags": max_tags,
+                   "catalyst_ratio": catalyst_ratio, "history_hours": history_hours, "repetitions": repetitions},
+        "results": [],
+    }
+    rng = random.Random(42)
+    try:
+        for rows in sizes:
+            print(f"INFO: [Correlation Bench] Generating {rows} trade rows...")
+            with get_cursor() as cur:
+                populate(cur, rows, asset_cardinality, max_tags, catalyst_ratio, history_hours)
+            assets = [f"A{i}" for i in rng.sample(range(asset_cardinality), min(assets_per_tick, asset_cardinality))]
+            with get_cursor(commit=False) as cur:
+                cur.execute(sql.SQL("SET LOCAL search_path TO {}, public").format(sql.Identifier(BENCH_SCHEMA)))
+                for strategy in STRATEGIES:
+                    result = time_strategy(cur, strategy, assets, repetitions)
+                    report["results"].append({"rows": rows, "strategy": strategy, **result})
+                    print(f"INFO: [Correlation Bench] rows={rows} {strategy}: p50={result['p50_ms']}ms p99={result['p99_ms']}ms")
+    finally:
+        with get_cursor() as cur:
+            cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(BENCH_SCHEMA)))
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    print(f"INFO: [Correlation Bench] Report written to {output_path}")
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark cryptex correlation queries across table sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--asset-cardinality", type=int, default=200)
+    parser.add_argument("--assets-per-tick", type=int, default=20)
+    parser.add_argument("--max-tags", type=int, default=3)
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--output", default="correlation_bench.json")
+    args = parser.parse_args()
+    main(args.sizes, args.asset_cardinality, args.assets_per_tick, args.max_tags,
+         repetitions=args.repetitions, output_path=args.output)
@@ -0,0 +1,183 @@
+# Near-duplicate clustering for catalysts. One story syndicated by a dozen outlets
+# arrives as a dozen articles with slightly different headlines; each gets the
+# cluster_id of the first article of its story, so correlation can keep one
+# representative per story instead of multiplying every matching trade.
+#
+# Headline + description are normalized (numbers like "$100K" and "$100,000" become one
+# token, asset names and cashtags become their symbol, light suffix stripping), cut into
+# character 4-grams per word and fingerprinted with MinHash. Calibrated on syndicated
+# rewrites of the same story (tests/test_catalyst_clusters.py), rewrites score about
+# 0.3-0.8 estimated Jaccard and different stories on the same asset about 0.05-0.25,
+# so SIMILARITY_THRESHOLD is 0.27. Stories built on the same template ("SEC approves
+# spot X ETF" vs "SEC delays spot Y ETF") can still score higher and may cluster.
+# Lookup is sub-linear via LSH banding: the signature is cut into BANDS bands of
+# ROWS_PER_BAND values and only clusters sharing at least one whole band with the new
+# article are compared. 64 x 2 finds a pair at 0.27 similarity with ~99% probability.
+#
+# MinHash rather than SimHash: on headline-length text, SimHash puts rewrites of one
+# story as many bits apart as unrelated stories on the same topic.
+import re, hashlib, random
+from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from psycopg2.extras import execute_values
+from s_asset_tagger import load_aliases
+
+BANDS = 64
+ROWS_PER_BAND = 2
+NUM_PERMUTATIONS = BANDS * ROWS_PER_BAND
+SIMILARITY_THRESHOLD = 0.27
+SHINGLE_SIZE = 4
+MERSENNE_PRIME = (1 << 61) - 1
+TOKEN_RE = re.compile(r"\d+(?:\.\d+)?|[a-z0-9]+")
+AMOUNT_RE = re.compile(r"\$?(\d[\d,]*(?:\.\d+)?)\s*(thousand|million|billion|trillion|bn|mn|k|m|b|t)?\b")
+PERCENT_RE = re.compile(r"(\d)\s*(?:%|percent\b)")
+MULTIPLIERS = {"thousand": 1e3, "k": 1e3, "million": 1e6, "mn": 1e6, "m": 1e6,
+               "billion": 1e9, "bn": 1e9, "b": 1e9, "trillion": 1e12, "t": 1e12}
+NUMBER_WORDS = {"one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+                "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10"}
+NUMBER_WORD_RE = re.compile(r"\b(%s)\b" % "|".join(NUMBER_WORDS))
+SUFFIXES = ("ing", "ed", "es", "s")
+# Filler words that differ between rewrites without changing the story
+STOPWORDS = {"a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "as", "at", "by", "with", "is", "are", "its",
+             "after", "from", "about", "roughly", "around", "s"}
+
+# Fixed seed: signatures are persisted, so every process must use the same permutations
+_rng = random.Random(1337)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+@lru_cache(maxsize=None)
+def _symbol_names() -> Tuple[Dict[str, str], Tuple[str, ...]]:
+    """Lowercased ticker/alias -> symbol from the tagger's dictionary, plus the multi-word names longest first."""
+    names = {}
+    for asset, entry in load_aliases().items():
+        for name in list(entry.get("tickers") or []) + list(entry.get("aliases") or []):
+            names[name.lower()] = asset.lower()
+    return names, tuple(sorted((n for n in names if " " in n), key=len, reverse=True))
+
+def _amount(match) -> str:
+    value = float(match.group(1).replace(",", "")) * MULTIPLIERS.get(match.group(2) or "", 1)
+    return f" {int(value)} " if value >= 1 and value == int(value) else f" {value:g} "
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix): return word[:-len(suffix)]
+    return word
+
+def normalize(text: str) -> List[str]:
+    """The words of `text` with amounts, percentages and asset names in one canonical form each."""
+    names, multi_word = _symbol_names()
+    text = text.lower().replace("u.s.", "us")
+    text = NUMBER_WORD_RE.sub(lambda m: NUMBER_WORDS[m.group(1)], text)
+    text = PERCENT_RE.sub(r"\1 pct", text)
+    text = AMOUNT_RE.sub(_amount, text)
+    for name in multi_word:
+        text = text.replace(name, names[name])
+    words = (names.get(t, t) for t in TOKEN_RE.findall(text))
+    return [_stem(w) for w in words if w not in STOPWORDS]
+
+def shingles(text: str) -> set:
+    """Character SHINGLE_SIZE-grams of every normalized word, padded so short words still count."""
+    grams = set()
+    for word in normalize(text):
+        padded = f" {word} "
+        grams.update(padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1)))
+    return grams
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big") % MERSENNE_PRIME
+
+def minhash(text: str) -> Optional[List[int]]:
+    """MinHash signature of `text`'s shingles; None when it has no words."""
+    hashes = [_token_hash(t) for t in shingles(text)]
+    if not hashes: return None
+    return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+def band_keys(signature: List[int]) -> List[Tuple[int, int]]:
+    """(band, value) pairs; each band's rows are folded into one signed 64-bit value."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(",".join(map(str, rows)).encode("ascii"), digest_size=8).digest()
+        keys.append((band, int.from_bytes(digest, "big", signed=True)))
+    return keys
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERMUTATIONS
+
+def catalyst_text(event: Dict[str, Any]) -> str:
+    raw_data = event.get("raw_data") or {}
+    return f"{event.get('headline') or ''}\n{raw_data.get('description') or ''}"
+
+def _candidates(cur, signatures: List[List[int]]) -> Dict[int, List[int]]:
+    """
+    cluster_id -> representative signature for every stored cluster sharing a band with any signature.
+    Clusters fingerprinted with a different number of permutations are skipped; they age out via prune_clusters.
+    """
+    keys = sorted({key for s in signatures for key in band_keys(s)})
+    if not keys: return {}
+    cur.execute(
+        """
+        SELECT DISTINCT c.cluster_id, c.signature FROM public.catalyst_cluster_bands b
+        JOIN public.catalyst_clusters c ON c.cluster_id = b.cluster_id
+        WHERE (b.band, b.band_value) IN (SELECT * FROM unnest(%s::smallint[], %s::bigint[]))
+          AND cardinality(c.signature) = %s
+        """,
+        ([k[0] for k in keys], [k[1] for k in keys], NUM_PERMUTATIONS)
+    )
+    return {cluster_id: list(signature) for cluster_id, signature in cur.fetchall()}
+
+def _create_cluster(cur, signature: List[int]) -> int:
+    cur.execute("INSERT INTO public.catalyst_clusters (signature) VALUES (%s) RETURNING cluster_id", (signature,))
+    cluster_id = cur.fetchone()[0]
+    execute_values(
+        cur, "INSERT INTO public.catalyst_cluster_bands (band, band_value, cluster_id) VALUES %s ON CONFLICT DO NOTHING",
+        [(band, value, cluster_id) for band, value in band_keys(signature)]
+    )
+    return cluster_id
+
+def assign_clusters(cur, events: List[Dict[str, Any]], threshold: float = SIMILARITY_THRESHOLD) -> Dict[str, int]:
+    """
+    Sets "cluster_id" on every catalyst event in place, creating a cluster for each
+    story not seen before. Call it in the transaction that inserts the events.
+
+    Returns how many events joined an existing cluster and how many clusters were created.
+    """
+    stats = {"joined": 0, "created": 0}
+    if not events: return stats
+    # Serialises concurrent clustering runs so one story cannot found two clusters
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('catalyst_clusters'))")
+    signatures = [minhash(catalyst_text(e)) for e in events]
+    known = _candidates(cur, [s for s in signatures if s])
+    # Clusters created in this batch are indexed in memory too, so duplicates within one fetch collapse
+    index: Dict[Tuple[int, int], List[int]] = {}
+    for cluster_id, signature in known.items():
+        for key in band_keys(signature): index.setdefault(key, []).append(cluster_id)
+    for event, signature in zip(events, signatures):
+        if signature is None:
+            event["cluster_id"] = None
+            continue
+        candidates = dict.fromkeys(c for key in band_keys(signature) for c in index.get(key, []))
+        scored = [(similarity(signature, known[c]), c) for c in candidates]
+        best: Optional[Tuple[float, int]] = max(scored, default=None)
+        if best is not None and best[0] >= threshold:
+            event["cluster_id"] = best[1]
+            stats["joined"] += 1
+            continue
+        cluster_id = _create_cluster(cur, signature)
+        known[cluster_id] = signature
+        for key in band_keys(signature): index.setdefault(key, []).append(cluster_id)
+        event["cluster_id"] = cluster_id
+        stats["created"] += 1
+    if stats["joined"]:
+        cur.execute(
+            "UPDATE public.catalyst_clusters SET last_seen_at = NOW() WHERE cluster_id = ANY(%s)",
+            (list({e["cluster_id"] for e in events if e.get("cluster_id") is not None}),)
+        )
+    return stats
+
+def prune_clusters(cur, now: datetime, retention_hours: int) -> int:
+    """Forgets stories nobody has republished within the retention; their bands go with them."""
+    cur.execute("DELETE FROM public.catalyst_clusters WHERE last_seen_at < %s", (now - timedelta(hours=retention_hours),))
+    return cur.rowcount
@@ -0,0 +1,200 @@
+# Polls many leaderboard traders concurrently under one global request budget.
+# Each trader has its own polling interval: a trader whose positions just changed
+# is polled at the minimum interval, and every unchanged poll backs the interval
+# off towards the maximum. Intervals persist in Postgres between runs.
+# A run stops polling at its deadline and holds an advisory lock, so cron ticks never
+# overlap and the request budget really is global.
+import time, json, math, hashlib, statistics
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional
+from psycopg2.extras import execute_values
+from s_db import get_cursor, pool_size
+from s_rate_limit import TokenBucket
+from s_cex_trader_monitor import fetch_positions, ingest_positions
+from s_metrics import flush
+
+class TraderState:
+    def __init__(self, uid: str, interval: float, next_due: float = 0.0, fingerprint: Optional[str] = None):
+        self.uid = uid
+        self.interval = interval
+        self.next_due = next_due
+        self.fingerprint = fingerprint
+        self.latencies = deque(maxlen=100)
+        self.polls = 0
+        self.changes = 0
+        self.errors = 0
+
+def positions_fingerprint(positions: List[Dict[str, Any]]) -> str:
+    """Identifies a position set by what matters for trading, ignoring mark price and PnL noise."""
+    key = sorted((p.get("symbol"), str(p.get("amount")), str(p.get("leverage"))) for p in positions)
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+
+class AdaptivePollScheduler:
+    def __init__(self, trader_uids: List[str], max_requests_per_second: float = 5.0,
+                 min_interval: float = 10.0, max_interval: float = 600.0, backoff: float = 1.5, workers: int = 16):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.workers = workers
+        self.bucket = TokenBucket(max_requests_per_second)
+        self.traders = {uid: TraderState(uid, min_interval) for uid in dict.fromkeys(trader_uids)}
+        self.inserted_assets: List[str] = []
+        self.deadline = float("inf")
+
+    def load_state(self):
+        """Restores intervals and fingerprints saved by earlier runs."""
+        with get_cursor(commit=False) as cur:
+            cur.execute(
+                "SELECT trader_uid, poll_interval_seconds, EXTRACT(EPOCH FROM next_poll_at), positions_fingerprint "
+                "FROM public.cex_trader_schedule WHERE trader_uid = ANY(%s)",
+                (list(self.traders),)
+            )
+            for uid, interval, next_poll_at, fingerprint in cur.fetchall():
+                state = self.traders[uid]
+                state.interval = min(max(float(interval), self.min_interval), self.max_interval)
+                state.next_due = float(next_poll_at or 0.0)
+                state.fingerprint = fingerprint
+
+    def save_state(self):
+        rows = [(s.uid, s.interval, s.next_due, s.fingerprint) for s in self.traders.values()]
+        with get_cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO public.cex_trader_schedule (trader_uid, poll_interval_seconds, next_poll_at, positions_fingerprint)
+                VALUES %s
+                ON CONFLICT (trader_uid) DO UPDATE SET
+                    poll_interval_seconds = EXCLUDED.poll_interval_seconds,
+                    next_poll_at = EXCLUDED.next_poll_at,
+                    positions_fingerprint = EXCLUDED.positions_fingerprint
+                """,
+                rows, template="(%s, %s, to_timestamp(%s), %s)"
+            )
+
+    def poll(self, state: TraderState) -> List[str]:
+        """Fetches one trader, adapts its interval and ingests its positions if they changed."""
+        if not self.bucket.acquire(timeout=max(0.0, self.deadline - time.time())):
+            # Out of time for this run; the trader stays due and goes first next run
+            return []
+        started = time.monotonic()
+        try:
+            positions = fetch_positions(state.uid)
+        except Exception as e:
+            state.errors += 1
+            state.interval = min(state.interval * self.backoff, self.max_interval)
+            print(f"ERROR: [CEX Scheduler] Could not fetch trader {state.uid}. Error: {e}")
+            return []
+        finally:
+            state.latencies.append(time.monotonic() - started)
+            state.polls += 1
+            state.next_due = time.time() + state.interval
+        fingerprint = positions_fingerprint(positions)
+        if fingerprint == state.fingerprint:
+            # Dormant: back off towards the maximum interval
+            state.interval = min(state.interval * self.backoff, self.max_interval)
+            state.next_due = time.time() + state.interval
+            return []
+        try:
+            assets = ingest_positions(state.uid, positions)
+        except Exception as e:
+            state.errors += 1
+            print(f"ERROR: [CEX Scheduler] Could not ingest positions for {state.uid}. Error: {e}")
+            return []
+        # Active: poll again as soon as the budget allows
+        state.fingerprint = fingerprint
+        state.changes += 1
+        state.interval = self.min_interval
+        state.next_due = time.time() + state.interval
+        return assets
+
+    def run(self, duration_seconds: float) -> List[str]:
+        """
+        Polls due traders until `duration_seconds` have passed and returns the inserted assets.
+        No poll starts after the deadline; only fetches already under way are finished.
+        """
+        deadline = self.deadline = time.time() + duration_seconds
+        # More in flight than the budget allows per second would only queue on the bucket,
+        # and more than the pool minus run_lock's connection would only queue on the pool
+        max_in_flight = max(1, min(self.workers, math.ceil(self.bucket.rate), pool_size() - 1))
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            while True:
+                now = time.time()
+                if now < deadline:
+                    due = sorted((s for s in self.traders.values() if s.next_due <= now and s.uid not in in_flight),
+                                 key=lambda s: s.next_due)
+                    for state in due[:max_in_flight - len(in_flight)]:
+                        in_flight[state.uid] = pool.submit(self.poll, state)
+                if not in_flight and now >= deadline: break
+                next_due = min((s.next_due for s in self.traders.values() if s.uid not in in_flight), default=deadline)
+                timeout = max(0.0, min(next_due, deadline) - time.time())
+                if len(in_flight) >= max_in_flight: timeout = max(0.0, deadline - time.time())
+                if in_flight:
+                    done, _ = wait(in_flight.values(), timeout=timeout if now < deadline else None, return_when=FIRST_COMPLETED)
+                    for uid in [uid for uid, f in in_flight.items() if f in done]:
+                        self.inserted_assets.extend(in_flight.pop(uid).result())
+                else:
+                    time.sleep(timeout)
+        return self.inserted_assets
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Per-trader polling interval, counters and fetch latency in milliseconds."""
+        report = {}
+        for s in self.traders.values():
+            latencies = sorted(s.latencies)
+            report[s.uid] = {
+                "interval_seconds": round(s.interval, 1),
+                "polls": s.polls,
+                "changes": s.changes,
+                "errors": s.errors,
+                "latency_p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+                "latency_max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+            }
+        return report
+
+@contextmanager
+def run_lock():
+    """Yields False when another scheduler run holds the lock. Held for the whole run, in its own transaction."""
+    with get_cursor(commit=False) as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('cex_scheduler'))")
+        yield cur.fetchone()[0]
+
+def main(trader_uids: List[str], duration_seconds: float = 55.0, max_requests_per_second: float = 5.0,
+         min_interval: float = 10.0, max_interval: float = 600.0) -> Dict[str, Any]:
+    """
+    Runs the adaptive scheduler for one cron tick.
+
+    Args:
+        trader_uids: Binance leaderboard encryptedUids to follow.
+        duration_seconds: How long to keep polling; slightly under the cron period.
+        max_requests_per_second: Global request budget across all traders.
+        min_interval: Polling interval for traders whose positions just changed.
+        max_interval: Ceiling for dormant traders' back-off.
+
+    Returns:
+        The unique assets ingested and the per-trader report.
+    """
+    print(f"INFO: [CEX Scheduler] Following {len(trader_uids)} trader(s) for {duration_seconds}s.")
+    scheduler = AdaptivePollScheduler(trader_uids, max_requests_per_second, min_interval, max_interval)
+    if pool_size() < 2:
+        raise ValueError("CRYPTEX_DB_POOL_MAX must be at least 2: the scheduler holds one connection for its lock.")
+    with run_lock() as acquired:
+        if not acquired:
+            print("INFO: [CEX Scheduler] Previous run still active, skipping this tick.")
+            return {"assets": [], "traders": {}, "skipped": True}
+        try:
+            scheduler.load_state()
+        except Exception as e:
+            print(f"ERROR: [CEX Scheduler] Could not load schedule state, starting fresh. Error: {e}")
+        assets = scheduler.run(duration_seconds)
+        try:
+            scheduler.save_state()
+        except Exception as e:
+            print(f"ERROR: [CEX Scheduler] Could not save schedule state. Error: {e}")
+    report = scheduler.report()
+    flush("cex_scheduler")
+    for uid, stats in report.items():
+        print(f"INFO: [CEX Scheduler] {uid}: {stats}")
+    return {"assets": list(dict.fromkeys(assets)), "traders": report}
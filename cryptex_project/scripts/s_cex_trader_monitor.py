@@ -1,29 +1,32 @@
-import os, requests, json, psycopg2
 from typing import List, Dict, Any
+import s_http_client as http_client
+from s_position_snapshots import ingest_position_changes
+from s_metrics import timer, flush
 
-def main() -> List[str]:
+# This is a conceptual endpoint. The real Binance Leaderboard API is needed here.
+LEADERBOARD_POSITION_URL = "https://fapi.binance.com/fapi/v1/leaderboard/getOtherPosition"
+
+def fetch_positions(encrypted_uid: str) -> List[Dict[str, Any]]:
+    """Fetches the open positions of one leaderboard trader over the shared keep-alive session."""
+    with timer("fetch_binance"):
+        res = http_client.get(LEADERBOARD_POSITION_URL, params={"encryptedUid": encrypted_uid}, timeout=15)
+    res.raise_for_status()
+    return (res.json().get('data') or {}).get('otherPositionRetList') or []
+
+def ingest_positions(trader_id: str, positions: List[Dict[str, Any]]) -> List[str]:
+    """Ingests only what changed since the trader's last snapshot and returns the affected assets."""
+    trade_events = ingest_position_changes(trader_id, positions)
+    print(f"INFO: [CEX Monitor] {trader_id}: {len(trade_events)} position change(s).")
+    return [event["asset"] for event in trade_events]
+
+def main(encrypted_uid: str = "4258234B3958932C2556734194539825", trader_id: str = "BinanceWhale1") -> List[str]:
     print("INFO: [CEX Monitor] Fetching CEX top trader positions...")
-    conn = psycopg2.connect(host='postgres', dbname='windmill', user='windmill', password='windmill')
-    # This is a conceptual endpoint. The real Binance Leaderboard API is needed here.
-    url = f"https://fapi.binance.com/fapi/v1/leaderboard/getOtherPosition?encryptedUid=4258234B3958932C2556734194539825"
     inserted_assets = []
     try:
-        res = requests.get(url, timeout=15)
-        res.raise_for_status()
-        positions = res.json().get('data', {}).get('otherPositionRetList', [])
+        positions = fetch_positions(encrypted_uid)
         print(f"INFO: [CEX Monitor] Found {len(positions)} open positions.")
-        with conn.cursor() as cur:
-            for pos in positions:
-                asset = pos.get("symbol")
-                trade_event = {"trader_id": "BinanceWhale1", "asset": asset, "raw_pos": pos}
-                cur.execute(
-                    "INSERT INTO public.recent_trades (trader_id, asset, raw_data) VALUES (%s, %s, %s)",
-                    (trade_event['trader_id'], trade_event['asset'], json.dumps(trade_event['raw_pos']))
-                )
-                inserted_assets.append(asset)
-        conn.commit()
+        inserted_assets = ingest_positions(trader_id, positions)
     except Exception as e:
         print(f"ERROR: [CEX Monitor] Could not fetch CEX trades. Error: {e}")
-    finally:
-        conn.close()
-    return inserted_assets
\ No newline at end of file
+    flush("cex_monitor")
+    return inserted_assets
@@ -1,29 +1,135 @@
-import psycopg2, json
-from typing import List
+import time, hashlib
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from s_db import get_cursor
+from s_ingest import insert_signals
+from s_signal_scorer import score_signals, filter_confident
+from s_asset_aggregates import get_rolling_aggregates
+from s_metrics import timer, observe_lag, flush
 
-def main(assets_to_check: List[str]):
+SIGNAL_COLUMNS = """
+t.id, t.trader_id, t.asset, t.ingested_at, t.raw_data,
+c.id, c.ingested_at, c.headline, c.source, c.raw_data, c.cluster_id
+"""
+
+# Resolves every requested asset in one round trip. Catalysts are narrowed with an
+# array overlap (served by the GIN index on asset_tags) and trades by asset = ANY(...)
+# (served by the composite (asset, ingested_at) index). Syndicated copies of one story
+# share a cluster_id; each trade is paired with the earliest copy only.
+BATCH_QUERY = """
+WITH catalysts AS (
+    SELECT c.id, c.ingested_at, c.headline, c.source, c.asset_tags, c.raw_data, c.cluster_id FROM recent_catalysts c
+    WHERE c.asset_tags && %(assets)s::text[]
+    AND c.ingested_at > (COALESCE(%(as_of)s::timestamptz, NOW()) - INTERVAL '5 minutes')
+    AND c.ingested_at <= COALESCE(%(as_of)s::timestamptz, NOW())
+)
+SELECT DISTINCT ON (t.id, COALESCE(c.cluster_id, -c.id)) """ + SIGNAL_COLUMNS + """
+FROM recent_trades t JOIN catalysts c ON t.asset = ANY(c.asset_tags)
+WHERE t.asset = ANY(%(assets)s::text[])
+AND t.ingested_at > (COALESCE(%(as_of)s::timestamptz, NOW()) - INTERVAL '5 minutes')
+AND t.ingested_at <= COALESCE(%(as_of)s::timestamptz, NOW())
+ORDER BY t.id, COALESCE(c.cluster_id, -c.id), c.ingested_at, c.id;
+"""
+
+PER_ASSET_QUERY = """
+SELECT """ + SIGNAL_COLUMNS + """ FROM recent_trades t JOIN recent_catalysts c ON c.asset_tags @> ARRAY[%s]
+WHERE t.asset = %s AND t.ingested_at > (NOW() - INTERVAL '5 minutes')
+AND c.ingested_at > (NOW() - INTERVAL '5 minutes');
+"""
+
+def dedupe_assets(assets_to_check: List[str]) -> List[str]:
+    """Drops empty entries and repeats while keeping the first-seen order."""
+    return list(dict.fromkeys(a for a in assets_to_check if a))
+
+def signal_id(trade_id: int, catalyst_id: int, cluster_id: Optional[int] = None) -> str:
+    """
+    Deterministic id, so the same trade/catalyst pair is one signal no matter how often it is found.
+    Clustered catalysts are keyed by their story, so a later copy cannot re-alert the same trade.
+    """
+    key = f"{trade_id}:{catalyst_id}" if cluster_id is None else f"{trade_id}:story:{cluster_id}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def build_signal(row) -> Dict[str, Any]:
+    """Turns one correlation row into a signal carrying the trading_signals columns."""
+    trade_id, trader_id, asset, trade_at, trade, catalyst_id, catalyst_at, headline, source, catalyst, cluster_id = row
+    trade = trade or {}
+    return {
+        "signal_id": signal_id(trade_id, catalyst_id, cluster_id),
+        "trade": trade,
+        "catalyst": catalyst,
+        "trader_wallet": trader_id,
+        "exchange": trade.get("exchange"),
+        "asset": asset,
+        "direction": trade.get("direction"),
+        "trade_size_usd": trade.get("notional_usd"),
+        "leverage": trade.get("leverage"),
+        "catalyst_source": source,
+        "catalyst_headline": headline,
+        "time_delta_minutes": int(abs((catalyst_at - trade_at).total_seconds()) // 60),
+        "ai_confidence_score": None,
+        # Epoch timestamps carried downstream for the latency metrics
+        "source_ts": trade.get("event_ts"),
+        "ingested_ts": max(trade_at, catalyst_at).timestamp(),
+        "created_ts": time.time(),
+    }
+
+def correlate_batch(cur, assets: List[str], as_of: Optional[datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Finds trade/catalyst pairs for all assets with a single set-based query, grouped by asset.
+    The 5-minute window ends now, or at `as_of` when replaying history.
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    cur.execute(BATCH_QUERY, {"assets": assets, "as_of": as_of})
+    for row in cur.fetchall():
+        signal = build_signal(row)
+        grouped.setdefault(signal["asset"], []).append(signal)
+    return grouped
+
+def correlate_per_asset(cur, assets: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """The original one-query-per-asset strategy, kept for comparison."""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for asset in assets:
+        cur.execute(PER_ASSET_QUERY, (asset, asset))
+        results = cur.fetchall()
+        if results:
+            grouped[asset] = [build_signal(res) for res in results]
+    return grouped
+
+def main(assets_to_check: List[str], batch_mode: bool = True, min_confidence: Optional[int] = None):
     print(f"INFO: [Correlation Engine] Checking for correlations for assets: {assets_to_check}")
     if not assets_to_check: return {"status": "no_assets_to_check"}
-    
-    conn = psycopg2.connect(host='postgres', dbname='windmill', user='windmill', password='windmill')
+    assets = dedupe_assets(assets_to_check)
+
     signals = []
-    with conn.cursor() as cur:
-        for asset in assets_to_check:
-            # This is a simplified correlation logic. A real one would be more complex.
-            # Find a trade and a catalyst for the same asset within the last 5 minutes.
-            query = """
-            SELECT t.raw_data, c.raw_data FROM recent_trades t JOIN recent_catalysts c ON c.asset_tags @> ARRAY[%s]
-            WHERE t.asset = %s AND t.ingested_at > (NOW() - INTERVAL '5 minutes') 
-            AND c.ingested_at > (NOW() - INTERVAL '5 minutes');
-            """
-            cur.execute(query, (asset, asset))
-            results = cur.fetchall()
-            if results:
-                print(f"SUCCESS: [Correlation Engine] Found {len(results)} correlated event(s) for {asset}!")
-                for res in results:
-                    # In a real system, you would pass this to the AI analysis and alerting flows
-                    signals.append({"trade": res[0], "catalyst": res[1]})
-    conn.close()
-    
+    with get_cursor() as cur:
+        # This is a simplified correlation logic. A real one would be more complex.
+        # Find a trade and a catalyst for the same asset within the last 5 minutes.
+        with timer("correlation_query"):
+            grouped = correlate_batch(cur, assets) if batch_mode else correlate_per_asset(cur, assets)
+        candidates = [s for asset_signals in grouped.values() for s in asset_signals]
+        # Rolling flow per asset ("three whales went long SOL in 10 minutes") feeds the crowding feature
+        context = get_rolling_aggregates(cur, list(grouped))
+        for s in candidates:
+            s["context"] = context[s["asset"]]
+        # All candidates are scored in one vectorized pass and persisted with their score
+        with timer("scoring"):
+            score_signals(candidates)
+        # Pairs already persisted on an earlier tick are dropped here, so each signal flows downstream once
+        new_ids = set(insert_signals(cur, candidates))
+
+    for asset, asset_signals in grouped.items():
+        # Low-confidence signals stay in trading_signals but are not passed on
+        new_signals = filter_confident([s for s in asset_signals if s["signal_id"] in new_ids], min_confidence)
+        if not new_signals: continue
+        for s in new_signals:
+            # A signal exists once its later half has been ingested
+            observe_lag("ingest_to_signal", s["ingested_ts"], s["created_ts"])
+        print(f"SUCCESS: [Correlation Engine] Found {len(new_signals)} new correlated event(s) for {asset}!")
+        # In a real system, you would pass this to the AI analysis and alerting flows
+        signals.extend(new_signals)
+
+    # Highest-confidence signals go out first
+    signals.sort(key=lambda s: s.get("ai_confidence_score") or 0, reverse=True)
+    flush("correlation_engine")
     # For now, we just return the found signals. Later, this will call other flows.
-    return signals
\ No newline at end of file
+    return signals
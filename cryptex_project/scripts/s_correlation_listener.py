@@ -0,0 +1,94 @@
+# Event-driven correlation. Listens on the cryptex_events channel that the insert
+# triggers on recent_trades/recent_catalysts notify, debounces bursts, and runs the
+# correlation engine only for the assets that actually changed. The minute cron in
+# f_02 stays as a fallback sweep for anything missed while the listener was down.
+import time, select
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Set
+import psycopg2
+import psycopg2.extensions
+from s_db import connection_params
+import s_correlation_engine
+import s_telegram_dispatcher
+
+CHANNEL = "cryptex_events"
+
+def _connect():
+    # LISTEN needs its own long-lived autocommit connection, outside the shared pool
+    conn = psycopg2.connect(**connection_params())
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {CHANNEL};")
+    return conn
+
+def _drain(conn, pending: Set[str]):
+    conn.poll()
+    while conn.notifies:
+        payload = conn.notifies.pop(0).payload
+        if payload: pending.add(payload)
+
+def main(duration_seconds: float = 590.0, debounce_seconds: float = 0.5, max_delay_seconds: float = 2.0,
+         send_alerts: bool = True, coalesce_window_seconds: float = 5.0) -> Dict[str, Any]:
+    """
+    Listens for new events and correlates the affected assets.
+
+    Args:
+        duration_seconds: How long to listen before returning; 0 listens forever.
+        debounce_seconds: Quiet period that ends a burst of notifications.
+        max_delay_seconds: Upper bound on how long a burst can postpone correlation.
+        send_alerts: Hand new signals to s_telegram_dispatcher in the background.
+        coalesce_window_seconds: Passed to the dispatcher.
+
+    Returns:
+        How many correlation runs were made, how many signals they produced and how many failed.
+    """
+    deadline = time.time() + duration_seconds if duration_seconds else None
+    stats = {"runs": 0, "assets_checked": 0, "signals": 0, "errors": 0, "reconnects": 0}
+    alert_pool = ThreadPoolExecutor(max_workers=1)
+    conn = None
+    print(f"INFO: [Correlation Listener] Listening on '{CHANNEL}'.")
+    try:
+        while deadline is None or time.time() < deadline:
+            try:
+                if conn is None or conn.closed:
+                    conn = _connect()
+                pending: Set[str] = set()
+                timeout = 5.0 if deadline is None else max(0.0, min(5.0, deadline - time.time()))
+                if select.select([conn], [], [], timeout) == ([], [], []): continue
+                _drain(conn, pending)
+                # Keep collecting until the burst goes quiet or the max delay is reached
+                burst_end = time.monotonic() + max_delay_seconds
+                while time.monotonic() < burst_end:
+                    wait = min(debounce_seconds, burst_end - time.monotonic())
+                    if select.select([conn], [], [], wait) == ([], [], []): break
+                    _drain(conn, pending)
+                if not pending: continue
+                assets = sorted(pending)
+                try:
+                    signals = s_correlation_engine.main(assets)
+                except Exception as e:
+                    # One bad batch must not stop the listener; the f_02 sweep picks these assets up again
+                    print(f"ERROR: [Correlation Listener] Correlation failed for {len(assets)} asset(s). Error: {e}")
+                    stats["errors"] += 1
+                    continue
+                stats["runs"] += 1
+                stats["assets_checked"] += len(assets)
+                if isinstance(signals, list) and signals:
+                    stats["signals"] += len(signals)
+                    if send_alerts:
+                        alert_pool.submit(s_telegram_dispatcher.main, signals, coalesce_window_seconds)
+            except psycopg2.Error as e:
+                print(f"ERROR: [Correlation Listener] Connection lost, reconnecting. Error: {e}")
+                stats["reconnects"] += 1
+                if conn is not None and not conn.closed: conn.close()
+                conn = None
+                time.sleep(1.0)
+            except Exception as e:
+                print(f"ERROR: [Correlation Listener] Unexpected error, still listening. Error: {e}")
+                stats["errors"] += 1
+                time.sleep(1.0)
+    finally:
+        if conn is not None and not conn.closed: conn.close()
+        alert_pool.shutdown(wait=True)
+    print(f"INFO: [Correlation Listener] {stats}")
+    return stats
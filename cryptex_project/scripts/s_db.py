@@ -0,0 +1,108 @@
+# Shared Postgres access for the cryptex scripts.
+# Holds one process-level connection pool so repeated calls (webhook bursts, the
+# scheduler, the listener) reuse connections instead of paying a TCP+auth handshake
+# each time. Connection parameters and pool size come from the environment.
+# psycopg2's pool raises PoolError when every connection is taken, so checkouts are
+# bounded by a semaphore of the same size: a caller waits up to CRYPTEX_DB_POOL_TIMEOUT
+# seconds for a free connection instead of failing while, e.g., the scheduler holds
+# its lock connection and its workers ingest.
+import os, threading
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple
+import psycopg2
+from psycopg2 import pool
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+POOL_TIMEOUT_SECONDS = float(os.environ.get("CRYPTEX_DB_POOL_TIMEOUT", "30"))
+
+def connection_params() -> Dict[str, Any]:
+    """Builds psycopg2 connection kwargs from the environment, defaulting to the docker-compose service."""
+    dsn = os.environ.get("CRYPTEX_DATABASE_URL")
+    if dsn: return {"dsn": dsn}
+    return {
+        "host": os.environ.get("CRYPTEX_DB_HOST", "postgres"),
+        "port": int(os.environ.get("CRYPTEX_DB_PORT", "5432")),
+        "dbname": os.environ.get("CRYPTEX_DB_NAME", "windmill"),
+        "user": os.environ.get("CRYPTEX_DB_USER", "windmill"),
+        "password": os.environ.get("CRYPTEX_DB_PASSWORD", "windmill"),
+        "connect_timeout": int(os.environ.get("CRYPTEX_DB_CONNECT_TIMEOUT", "5")),
+    }
+
+def _get_pool_and_slots() -> Tuple[pool.ThreadedConnectionPool, threading.BoundedSemaphore]:
+    global _pool, _slots
+    if _pool is None or _pool.closed:
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                min_size = int(os.environ.get("CRYPTEX_DB_POOL_MIN", "1"))
+                max_size = int(os.environ.get("CRYPTEX_DB_POOL_MAX", "10"))
+                _pool = pool.ThreadedConnectionPool(min_size, max_size, **connection_params())
+                _slots = threading.BoundedSemaphore(max_size)
+    return _pool, _slots
+
+def get_pool() -> pool.ThreadedConnectionPool:
+    """Returns the process-wide pool, creating it on first use."""
+    return _get_pool_and_slots()[0]
+
+def pool_size() -> int:
+    """How many connections the pool holds at most, i.e. how many callers can hold one at once."""
+    return get_pool().maxconn
+
+def _is_healthy(conn) -> bool:
+    if conn.closed: return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _checkout(db_pool: pool.ThreadedConnectionPool):
+    conn = db_pool.getconn()
+    if _is_healthy(conn): return conn
+    # Stale connection (server restart, idle timeout): drop it and open a fresh one.
+    print("INFO: [DB] Discarding broken pooled connection and reconnecting.")
+    db_pool.putconn(conn, close=True)
+    return db_pool.getconn()
+
+@contextmanager
+def get_connection(timeout: float = POOL_TIMEOUT_SECONDS):
+    """
+    Checks a health-checked connection out of the pool and always returns it.
+    Waits up to `timeout` seconds for one to be free, then raises PoolError.
+    """
+    db_pool, slots = _get_pool_and_slots()
+    if not slots.acquire(timeout=timeout):
+        raise pool.PoolError(f"No database connection free within {timeout}s (pool size {db_pool.maxconn}).")
+    try:
+        conn = _checkout(db_pool)
+        try:
+            yield conn
+        finally:
+            if not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+            db_pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        slots.release()
+
+@contextmanager
+def get_cursor(commit: bool = True):
+    """Yields a cursor; commits on success when `commit` is set and rolls back on error."""
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                yield cur
+            if commit: conn.commit()
+        except Exception:
+            if not conn.closed: conn.rollback()
+            raise
+
+def close_pool():
+    """Closes every pooled connection, e.g. before a long-lived process exits."""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool, _slots = None, None
@@ -16,26 +16,337 @@ CREATE TABLE IF NOT EXISTS public.trading_signals (
     status VARCHAR(50) DEFAULT 'NEW'
 );
 
--- Creates tables for our listeners to store recent events for correlation
+-- Creates tables for our listeners to store recent events for correlation.
+-- Both are range-partitioned by hour on ingested_at; s_partition_maintenance.py
+-- pre-creates upcoming partitions and drops expired ones instead of DELETE pruning.
+-- Tables created by older versions of this script were not partitioned; move them
+-- aside, with their indexes, so the partitioned tables can take their names (their
+-- rows are copied over and the old tables dropped further down). An index
+-- left behind under its old name would make the CREATE INDEX IF NOT EXISTS below a no-op.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+               WHERE n.nspname = 'public' AND c.relname = 'recent_trades' AND c.relkind = 'r') THEN
+        ALTER TABLE public.recent_trades RENAME TO recent_trades_unpartitioned;
+        ALTER INDEX IF EXISTS public.idx_recent_trades_time RENAME TO idx_recent_trades_unpartitioned_time;
+        ALTER INDEX IF EXISTS public.idx_recent_trades_asset_time RENAME TO idx_recent_trades_unpartitioned_asset_time;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+               WHERE n.nspname = 'public' AND c.relname = 'recent_catalysts' AND c.relkind = 'r') THEN
+        ALTER TABLE public.recent_catalysts RENAME TO recent_catalysts_unpartitioned;
+        ALTER INDEX IF EXISTS public.idx_recent_catalysts_time RENAME TO idx_recent_catalysts_unpartitioned_time;
+        ALTER INDEX IF EXISTS public.idx_recent_catalysts_tags RENAME TO idx_recent_catalysts_unpartitioned_tags;
+    END IF;
+END $$;
+
 CREATE TABLE IF NOT EXISTS public.recent_trades (
-    id SERIAL PRIMARY KEY,
-    ingested_at TIMESTAMPTZ DEFAULT NOW(),
+    id SERIAL,
+    ingested_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     trader_id VARCHAR(255),
     asset VARCHAR(50),
-    raw_data JSONB
-);
+    raw_data JSONB,
+    PRIMARY KEY (id, ingested_at)
+) PARTITION BY RANGE (ingested_at);
 
 CREATE TABLE IF NOT EXISTS public.recent_catalysts (
-    id SERIAL PRIMARY KEY,
-    ingested_at TIMESTAMPTZ DEFAULT NOW(),
+    id SERIAL,
+    ingested_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     headline TEXT,
     source VARCHAR(100),
     asset_tags TEXT[],
-    raw_data JSONB
+    raw_data JSONB,
+    content_hash CHAR(64),
+    cluster_id BIGINT,
+    PRIMARY KEY (id, ingested_at)
+) PARTITION BY RANGE (ingested_at);
+ALTER TABLE public.recent_catalysts ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+ALTER TABLE public.recent_catalysts ADD COLUMN IF NOT EXISTS cluster_id BIGINT;
+
+-- Content hashes (URL + title) of every catalyst seen. A partitioned table can only
+-- enforce uniqueness per partition, so dedup lives in this small side table.
+CREATE TABLE IF NOT EXISTS public.catalyst_fingerprints (
+    content_hash CHAR(64) PRIMARY KEY,
+    first_seen_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_catalyst_fingerprints_time ON public.catalyst_fingerprints(first_seen_at);
+
+-- Near-duplicate story clusters for s_catalyst_clusters. Each cluster keeps the MinHash
+-- signature of its first article; the bands are its LSH index.
+CREATE TABLE IF NOT EXISTS public.catalyst_clusters (
+    cluster_id BIGSERIAL PRIMARY KEY,
+    signature BIGINT[] NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    last_seen_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_catalyst_clusters_seen ON public.catalyst_clusters(last_seen_at);
+CREATE TABLE IF NOT EXISTS public.catalyst_cluster_bands (
+    band SMALLINT NOT NULL,
+    band_value BIGINT NOT NULL,
+    cluster_id BIGINT NOT NULL REFERENCES public.catalyst_clusters(cluster_id) ON DELETE CASCADE,
+    PRIMARY KEY (band, band_value, cluster_id)
+);
+CREATE INDEX IF NOT EXISTS idx_catalyst_cluster_bands_cluster ON public.catalyst_cluster_bands(cluster_id);
+
+-- High-water marks for incremental ingestion, one row per source
+CREATE TABLE IF NOT EXISTS public.ingest_state (
+    source VARCHAR(100) PRIMARY KEY,
+    high_water_mark TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
--- Prune old events to keep tables small and fast
+-- Catch-all partitions so inserts never fail when maintenance falls behind
+CREATE TABLE IF NOT EXISTS public.recent_trades_default PARTITION OF public.recent_trades DEFAULT;
+CREATE TABLE IF NOT EXISTS public.recent_catalysts_default PARTITION OF public.recent_catalysts DEFAULT;
+
+-- Creates the hourly partition <parent>_pYYYYMMDDHH (UTC) starting at hour_start.
+-- A partition cannot be created while the default partition holds rows in its range,
+-- so such rows are moved: the default is detached, the hour is created, its rows are
+-- moved into it and the default is reattached, all in the caller's transaction.
+-- Rows are moved partition to partition, so the parent's aggregate triggers do not
+-- count them twice.
+CREATE OR REPLACE FUNCTION public.ensure_hour_partition(parent TEXT, hour_start TIMESTAMPTZ) RETURNS TEXT AS $$
+DECLARE
+    part TEXT := parent || '_p' || to_char(hour_start AT TIME ZONE 'UTC', 'YYYYMMDDHH24');
+    default_part TEXT := parent || '_default';
+    hour_end TIMESTAMPTZ := hour_start + INTERVAL '1 hour';
+    stranded BOOLEAN := FALSE;
+BEGIN
+    IF to_regclass(format('public.%I', part)) IS NOT NULL THEN
+        RETURN part;
+    END IF;
+    IF to_regclass(format('public.%I', default_part)) IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM public.%I WHERE ingested_at >= $1 AND ingested_at < $2)', default_part)
+            INTO stranded USING hour_start, hour_end;
+    END IF;
+    IF stranded THEN
+        EXECUTE format('ALTER TABLE public.%I DETACH PARTITION public.%I', parent, default_part);
+    END IF;
+    EXECUTE format('CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                   part, parent, hour_start, hour_end);
+    IF stranded THEN
+        EXECUTE format('WITH moved AS (DELETE FROM public.%I WHERE ingested_at >= $1 AND ingested_at < $2 RETURNING *) '
+                       'INSERT INTO public.%I SELECT * FROM moved', default_part, part) USING hour_start, hour_end;
+        EXECUTE format('ALTER TABLE public.%I ATTACH PARTITION public.%I DEFAULT', parent, default_part);
+    END IF;
+    RETURN part;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The current and next few hours exist from the start, so live rows never pile up in the default partition
+SELECT public.ensure_hour_partition(parent, date_trunc('hour', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' + make_interval(hours => h))
+FROM unnest(ARRAY['recent_trades', 'recent_catalysts']) AS parent, generate_series(0, 3) AS h;
+
+-- Rows of the pre-partitioning tables moved aside above are copied into the partitioned
+-- ones with their ids (hours without a partition land in the default, which maintenance
+-- prunes), then the old tables are dropped. On an upgrade this runs before the triggers
+-- below exist, so the copy neither notifies the listener nor feeds the rolling aggregates.
+DO $$
+BEGIN
+    IF to_regclass('public.recent_trades_unpartitioned') IS NOT NULL THEN
+        INSERT INTO public.recent_trades (id, ingested_at, trader_id, asset, raw_data)
+        SELECT id, COALESCE(ingested_at, NOW()), trader_id, asset, raw_data FROM public.recent_trades_unpartitioned;
+        PERFORM setval(pg_get_serial_sequence('public.recent_trades', 'id'),
+                       GREATEST((SELECT MAX(id) FROM public.recent_trades), 1));
+        DROP TABLE public.recent_trades_unpartitioned;
+    END IF;
+    IF to_regclass('public.recent_catalysts_unpartitioned') IS NOT NULL THEN
+        INSERT INTO public.recent_catalysts (id, ingested_at, headline, source, asset_tags, raw_data)
+        SELECT id, COALESCE(ingested_at, NOW()), headline, source, asset_tags, raw_data FROM public.recent_catalysts_unpartitioned;
+        PERFORM setval(pg_get_serial_sequence('public.recent_catalysts', 'id'),
+                       GREATEST((SELECT MAX(id) FROM public.recent_catalysts), 1));
+        DROP TABLE public.recent_catalysts_unpartitioned;
+    END IF;
+END $$;
+
+-- Indexes are declared on the parents and created on every partition
 CREATE INDEX IF NOT EXISTS idx_recent_trades_time ON public.recent_trades(ingested_at);
 CREATE INDEX IF NOT EXISTS idx_recent_catalysts_time ON public.recent_catalysts(ingested_at);
-DELETE FROM recent_trades WHERE ingested_at < NOW() - INTERVAL '1 hour';
-DELETE FROM recent_catalysts WHERE ingested_at < NOW() - INTERVAL '1 hour';
\ No newline at end of file
+-- Support the batched correlation query: asset = ANY(...) on trades, tag overlap on catalysts
+CREATE INDEX IF NOT EXISTS idx_recent_trades_asset_time ON public.recent_trades(asset, ingested_at);
+CREATE INDEX IF NOT EXISTS idx_recent_catalysts_tags ON public.recent_catalysts USING GIN (asset_tags);
+
+-- Adaptive polling state for s_cex_scheduler, one row per followed trader
+CREATE TABLE IF NOT EXISTS public.cex_trader_schedule (
+    trader_uid VARCHAR(255) PRIMARY KEY,
+    poll_interval_seconds NUMERIC NOT NULL,
+    next_poll_at TIMESTAMPTZ,
+    positions_fingerprint CHAR(64)
+);
+
+-- Last seen CEX position per trader and symbol; polls are diffed against it
+CREATE TABLE IF NOT EXISTS public.cex_position_snapshots (
+    trader_id VARCHAR(255) NOT NULL,
+    symbol VARCHAR(50) NOT NULL,
+    amount NUMERIC NOT NULL,
+    leverage NUMERIC,
+    mark_price NUMERIC,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (trader_id, symbol)
+);
+-- Traders whose positions have been snapshotted at least once. A trader missing here has
+-- no baseline yet, so the first poll only seeds the snapshot instead of reporting every
+-- position already held as a fresh open.
+CREATE TABLE IF NOT EXISTS public.cex_position_baselines (
+    trader_id VARCHAR(255) PRIMARY KEY,
+    seeded_at TIMESTAMPTZ DEFAULT NOW()
+);
+INSERT INTO public.cex_position_baselines (trader_id)
+SELECT DISTINCT trader_id FROM public.cex_position_snapshots ON CONFLICT DO NOTHING;
+
+-- Durable outbound queue for s_telegram_dispatcher. One row is one Telegram message,
+-- possibly coalescing several signals for the same asset.
+CREATE TABLE IF NOT EXISTS public.alert_queue (
+    id SERIAL PRIMARY KEY,
+    chat_id VARCHAR(100) NOT NULL,
+    coalesce_key VARCHAR(255),
+    signals JSONB NOT NULL DEFAULT '[]',
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    sent_at TIMESTAMPTZ,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alert_queue_due ON public.alert_queue(next_attempt_at) WHERE status = 'PENDING';
+-- Set when a dispatcher claims a message (status SENDING) before sending it
+ALTER TABLE public.alert_queue ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
+
+-- Telegram rate limits shared by every process that sends alerts: the next free send
+-- slot per bucket ('global' for the bot, 'chat:<id>' per chat).
+CREATE TABLE IF NOT EXISTS public.telegram_send_slots (
+    bucket VARCHAR(120) PRIMARY KEY,
+    next_slot_at TIMESTAMPTZ NOT NULL
+);
+
+-- Event-driven correlation: every insert NOTIFYs the affected asset(s) on the
+-- cryptex_events channel for s_correlation_listener. Identical notifications in one
+-- transaction are merged by Postgres, so a bulk insert sends each asset once.
+CREATE OR REPLACE FUNCTION public.notify_cryptex_event() RETURNS trigger AS $$
+DECLARE
+    tag TEXT;
+BEGIN
+    IF TG_ARGV[0] = 'trade' THEN
+        IF NEW.asset IS NOT NULL THEN
+            PERFORM pg_notify('cryptex_events', NEW.asset);
+        END IF;
+    ELSE
+        FOREACH tag IN ARRAY COALESCE(NEW.asset_tags, '{}'::TEXT[]) LOOP
+            PERFORM pg_notify('cryptex_events', tag);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_recent_trades_notify ON public.recent_trades;
+CREATE TRIGGER trg_recent_trades_notify AFTER INSERT ON public.recent_trades
+    FOR EACH ROW EXECUTE FUNCTION public.notify_cryptex_event('trade');
+DROP TRIGGER IF EXISTS trg_recent_catalysts_notify ON public.recent_catalysts;
+CREATE TRIGGER trg_recent_catalysts_notify AFTER INSERT ON public.recent_catalysts
+    FOR EACH ROW EXECUTE FUNCTION public.notify_cryptex_event('catalyst');
+
+-- Cumulative latency histograms, one row per job and metric, folded in by s_metrics
+-- at the end of each job run. bucket_counts follows s_metrics.BUCKETS plus a final
+-- overflow bucket. The table stays a few dozen rows however long the pipeline runs.
+CREATE TABLE IF NOT EXISTS public.pipeline_metric_totals (
+    job VARCHAR(100) NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    count BIGINT NOT NULL,
+    sum_seconds DOUBLE PRECISION NOT NULL,
+    bucket_counts BIGINT[] NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (job, kind, name)
+);
+
+-- Older versions appended one row per flush to pipeline_metrics; fold those into the totals
+DO $$
+BEGIN
+    IF to_regclass('public.pipeline_metrics') IS NOT NULL THEN
+        INSERT INTO public.pipeline_metric_totals (job, kind, name, count, sum_seconds, bucket_counts)
+        SELECT t.job, t.kind, t.name, t.count, t.sum_seconds, b.bucket_counts FROM (
+            SELECT COALESCE(job, '') AS job, kind, name, SUM(count) AS count, SUM(sum_seconds) AS sum_seconds
+            FROM public.pipeline_metrics GROUP BY 1, 2, 3
+        ) t JOIN (
+            SELECT job, kind, name, array_agg(total ORDER BY i) AS bucket_counts FROM (
+                SELECT COALESCE(job, '') AS job, kind, name, u.i, SUM(u.b) AS total FROM public.pipeline_metrics,
+                unnest(bucket_counts) WITH ORDINALITY AS u(b, i) GROUP BY 1, 2, 3, 4
+            ) per_bucket GROUP BY 1, 2, 3
+        ) b USING (job, kind, name)
+        ON CONFLICT (job, kind, name) DO NOTHING;
+        DROP TABLE public.pipeline_metrics;
+    END IF;
+END $$;
+
+-- Per-asset minute buckets behind s_asset_aggregates' rolling 5m/1h/24h windows.
+-- Statement-level triggers fold each insert batch into the buckets in the same
+-- transaction, so the windows are read from at most 1440 small rows per asset
+-- instead of scanning raw_data. Buckets outlive the raw partitions and are pruned
+-- by s_partition_maintenance.
+-- A trade's side is the side of the flow it represents: opening or adding to a long
+-- (or cutting a short) is LONG flow, the reverse is SHORT flow.
+CREATE TABLE IF NOT EXISTS public.asset_minute_stats (
+    asset VARCHAR(50) NOT NULL,
+    minute TIMESTAMPTZ NOT NULL,
+    trade_count INT NOT NULL DEFAULT 0,
+    long_notional_usd DOUBLE PRECISION NOT NULL DEFAULT 0,
+    short_notional_usd DOUBLE PRECISION NOT NULL DEFAULT 0,
+    catalyst_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (asset, minute)
+);
+CREATE TABLE IF NOT EXISTS public.asset_minute_traders (
+    asset VARCHAR(50) NOT NULL,
+    minute TIMESTAMPTZ NOT NULL,
+    trader_id VARCHAR(255) NOT NULL,
+    side VARCHAR(10) NOT NULL,
+    PRIMARY KEY (asset, minute, trader_id, side)
+);
+
+CREATE OR REPLACE FUNCTION public.trade_flow_side(raw_data JSONB) RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN COALESCE(raw_data->>'direction', '') NOT IN ('LONG', 'SHORT') THEN NULL
+        WHEN (raw_data->>'direction' = 'LONG') <> (COALESCE(raw_data->>'event_type', '') IN ('close', 'decrease')) THEN 'LONG'
+        ELSE 'SHORT'
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.aggregate_new_trades() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO public.asset_minute_stats (asset, minute, trade_count, long_notional_usd, short_notional_usd)
+    SELECT asset, minute, COUNT(*),
+           COALESCE(SUM(notional) FILTER (WHERE side = 'LONG'), 0),
+           COALESCE(SUM(notional) FILTER (WHERE side = 'SHORT'), 0)
+    FROM (
+        SELECT asset, date_trunc('minute', ingested_at) AS minute, public.trade_flow_side(raw_data) AS side,
+               CASE WHEN jsonb_typeof(raw_data->'notional_usd') = 'number' THEN (raw_data->>'notional_usd')::DOUBLE PRECISION END AS notional
+        FROM new_rows WHERE asset IS NOT NULL
+    ) flow GROUP BY asset, minute
+    ON CONFLICT (asset, minute) DO UPDATE SET
+        trade_count = asset_minute_stats.trade_count + EXCLUDED.trade_count,
+        long_notional_usd = asset_minute_stats.long_notional_usd + EXCLUDED.long_notional_usd,
+        short_notional_usd = asset_minute_stats.short_notional_usd + EXCLUDED.short_notional_usd;
+
+    INSERT INTO public.asset_minute_traders (asset, minute, trader_id, side)
+    SELECT DISTINCT asset, date_trunc('minute', ingested_at), trader_id, public.trade_flow_side(raw_data) FROM new_rows
+    WHERE asset IS NOT NULL AND trader_id IS NOT NULL AND public.trade_flow_side(raw_data) IS NOT NULL
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.aggregate_new_catalysts() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO public.asset_minute_stats (asset, minute, catalyst_count)
+    SELECT tag, date_trunc('minute', ingested_at), COUNT(*)
+    FROM new_rows, unnest(COALESCE(asset_tags, '{}'::TEXT[])) AS tag GROUP BY 1, 2
+    ON CONFLICT (asset, minute) DO UPDATE SET catalyst_count = asset_minute_stats.catalyst_count + EXCLUDED.catalyst_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_recent_trades_aggregate ON public.recent_trades;
+CREATE TRIGGER trg_recent_trades_aggregate AFTER INSERT ON public.recent_trades
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.aggregate_new_trades();
+DROP TRIGGER IF EXISTS trg_recent_catalysts_aggregate ON public.recent_catalysts;
+CREATE TRIGGER trg_recent_catalysts_aggregate AFTER INSERT ON public.recent_catalysts
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.aggregate_new_catalysts();
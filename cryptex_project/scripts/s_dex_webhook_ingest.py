@@ -0,0 +1,98 @@
+# Parses Alchemy address-activity webhooks into normalized trade events.
+# One payload can carry many activities (every leg of every swap in a block); they
+# are all bulk-inserted at once and only the distinct affected assets go on to
+# correlation.
+import os
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from s_db import get_cursor
+from s_ingest import insert_trades
+from s_metrics import flush
+
+# Wrapped and liquid-staked tokens count as their underlying asset
+TOKEN_SYMBOL_TO_ASSET = {"WETH": "ETH", "STETH": "ETH", "WSTETH": "ETH", "WBTC": "BTC", "CBBTC": "BTC", "TBTC": "BTC"}
+# For contracts whose symbol Alchemy cannot resolve (lower-cased mainnet addresses)
+TOKEN_CONTRACT_TO_ASSET = {
+    "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2": "ETH",  # WETH
+    "0x2260fac5e5542a773aa44fbcfedf7c193bc2c599": "BTC",  # WBTC
+}
+# The quote side of a swap; its value prices the other legs but it is not a trade signal
+QUOTE_ASSETS = {"USDC", "USDT", "DAI", "USDE", "FDUSD", "PYUSD"}
+
+def activity_asset(activity: Dict[str, Any]) -> Optional[str]:
+    contract = ((activity.get("rawContract") or {}).get("address") or "").lower()
+    if contract in TOKEN_CONTRACT_TO_ASSET: return TOKEN_CONTRACT_TO_ASSET[contract]
+    symbol = (activity.get("asset") or "").upper()
+    if not symbol: return None
+    return TOKEN_SYMBOL_TO_ASSET.get(symbol, symbol)
+
+def _parse_ts(created_at: Optional[str]) -> Optional[float]:
+    if not created_at: return None
+    try:
+        return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def parse_address_activity(webhook_data: Dict[str, Any], watched_addresses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Normalizes an Alchemy ADDRESS_ACTIVITY payload into trade events.
+
+    A leg received by a watched wallet is a LONG, a leg sent by one is a SHORT. Without
+    a watch list the sender is recorded as the trader and the direction is unknown.
+    Stablecoin legs are dropped, but their value is used as the notional of the other
+    legs of the same transaction.
+    """
+    event = webhook_data.get("event") or {}
+    activities = event.get("activity") or []
+    watched = {a.lower() for a in (watched_addresses or [])}
+    event_ts = _parse_ts(webhook_data.get("createdAt"))
+
+    quote_value_by_tx: Dict[str, float] = {}
+    for activity in activities:
+        if activity_asset(activity) in QUOTE_ASSETS and isinstance(activity.get("value"), (int, float)):
+            tx = activity.get("hash")
+            quote_value_by_tx[tx] = quote_value_by_tx.get(tx, 0.0) + float(activity["value"])
+
+    trade_events, seen = [], set()
+    for activity in activities:
+        asset = activity_asset(activity)
+        if not asset or asset in QUOTE_ASSETS: continue
+        key = (activity.get("hash"), (activity.get("log") or {}).get("logIndex"), activity.get("category"), asset)
+        if key in seen: continue
+        seen.add(key)
+        sender = (activity.get("fromAddress") or "").lower()
+        receiver = (activity.get("toAddress") or "").lower()
+        if receiver in watched:
+            trader_id, direction = receiver, "LONG"
+        elif sender in watched or not watched:
+            trader_id, direction = sender, ("SHORT" if watched else None)
+        else:
+            continue
+        trade_events.append({
+            "trader_id": trader_id,
+            "asset": asset,
+            "raw_data": {
+                "exchange": f"DEX:{event.get('network', 'UNKNOWN')}",
+                "direction": direction,
+                "amount": activity.get("value"),
+                "notional_usd": quote_value_by_tx.get(activity.get("hash")),
+                "tx_hash": activity.get("hash"),
+                "event_ts": event_ts,
+                "activity": activity,
+            },
+        })
+    return trade_events
+
+# This script takes the webhook payload from Alchemy
+def main(webhook_data: dict, watched_addresses: Optional[List[str]] = None) -> List[str]:
+    if watched_addresses is None:
+        watched_addresses = [a for a in os.environ.get("CRYPTEX_DEX_WATCHED_WALLETS", "").split(",") if a]
+    trade_events = parse_address_activity(webhook_data, watched_addresses)
+    activity_count = len((webhook_data.get("event") or {}).get("activity") or [])
+    print(f"INFO: [DEX Ingest] Parsed {len(trade_events)} trade(s) from {activity_count} activities.")
+    if not trade_events: return []
+    with get_cursor() as cur:
+        inserted = insert_trades(cur, trade_events)
+    flush("dex_ingest")
+    # Return the distinct assets so the next step knows what to check
+    return list(dict.fromkeys(row["asset"] for row in inserted))
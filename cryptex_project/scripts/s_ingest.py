@@ -0,0 +1,119 @@
+# Bulk ingestion for recent_trades and recent_catalysts.
+# Writes a whole batch of normalized events with one multi-row INSERT ... VALUES
+# and hands back what was actually inserted via RETURNING.
+from typing import List, Dict, Any
+from psycopg2.extras import execute_values, Json
+from s_metrics import timer, observe_lag
+
+PAGE_SIZE = 500
+
+def _observe_source_lag(events: List[Dict[str, Any]]):
+    # Replayed events carry their own ingested_at, so their source lag is meaningless
+    for e in events:
+        if e.get("ingested_at") is None:
+            observe_lag("source_to_ingest", (e.get("raw_data") or {}).get("event_ts"))
+
+def insert_trades(cur, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Inserts trade events of the form {"trader_id", "asset", "raw_data"}, with an optional
+    "ingested_at" (defaults to now; set by replays).
+
+    Returns one {"id", "asset"} dict per inserted row.
+    """
+    if not events: return []
+    rows = [(e.get("trader_id"), e.get("asset"), Json(e.get("raw_data")), e.get("ingested_at")) for e in events]
+    with timer("db_insert"):
+        inserted = execute_values(
+            cur,
+            "INSERT INTO public.recent_trades (trader_id, asset, raw_data, ingested_at) VALUES %s RETURNING id, asset",
+            rows, template="(%s, %s, %s, COALESCE(%s::timestamptz, NOW()))", page_size=PAGE_SIZE, fetch=True
+        )
+    _observe_source_lag(events)
+    return [{"id": row[0], "asset": row[1]} for row in inserted]
+
+def drop_known_catalysts(cur, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drops catalyst events whose content_hash is already in catalyst_fingerprints, and
+    repeats of a hash within the batch, so re-fetched articles are not clustered again. insert_catalysts still enforces the dedup for concurrent runs.
+    """
+    hashes = list({e["content_hash"] for e in events if e.get("content_hash")})
+    known = set()
+    if hashes:
+        cur.execute("SELECT content_hash FROM public.catalyst_fingerprints WHERE content_hash = ANY(%s)", (hashes,))
+        known = {row[0] for row in cur.fetchall()}
+    fresh, seen = [], set()
+    for e in events:
+        content_hash = e.get("content_hash")
+        if content_hash is not None:
+            if content_hash in known or content_hash in seen: continue
+            seen.add(content_hash)
+        fresh.append(e)
+    return fresh
+
+# Catalysts carrying a content_hash are only inserted the first time that hash is
+# claimed in catalyst_fingerprints; rows without one are always inserted.
+INSERT_CATALYSTS_QUERY = """
+WITH incoming (headline, source, asset_tags, raw_data, content_hash, cluster_id, ingested_at) AS (VALUES %s),
+fresh AS (
+    INSERT INTO public.catalyst_fingerprints (content_hash)
+    SELECT content_hash FROM incoming WHERE content_hash IS NOT NULL
+    ON CONFLICT DO NOTHING RETURNING content_hash
+)
+INSERT INTO public.recent_catalysts (headline, source, asset_tags, raw_data, content_hash, cluster_id, ingested_at)
+SELECT i.headline, i.source, i.asset_tags, i.raw_data, i.content_hash, i.cluster_id, COALESCE(i.ingested_at, NOW()) FROM incoming i
+WHERE i.content_hash IS NULL OR i.content_hash IN (SELECT content_hash FROM fresh)
+RETURNING id, asset_tags, content_hash, cluster_id
+"""
+
+def insert_catalysts(cur, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Inserts catalyst events of the form {"headline", "source", "asset_tags", "raw_data"},
+    with an optional "content_hash" that makes the insert idempotent, an optional
+    "cluster_id" from s_catalyst_clusters and an optional "ingested_at" (defaults to
+    now; set by replays).
+
+    Returns one {"id", "asset_tags", "content_hash", "cluster_id"} dict per newly inserted row.
+    """
+    if not events: return []
+    rows, seen_hashes = [], set()
+    for e in events:
+        content_hash = e.get("content_hash")
+        if content_hash is not None:
+            if content_hash in seen_hashes: continue
+            seen_hashes.add(content_hash)
+        rows.append((e.get("headline"), e.get("source"), list(e.get("asset_tags") or []), Json(e.get("raw_data")), content_hash,
+                     e.get("cluster_id"), e.get("ingested_at")))
+    with timer("db_insert"):
+        inserted = execute_values(
+            cur, INSERT_CATALYSTS_QUERY, rows,
+            template="(%s::text, %s::text, %s::text[], %s::jsonb, %s::text, %s::bigint, %s::timestamptz)", page_size=PAGE_SIZE, fetch=True
+        )
+    _observe_source_lag(events)
+    return [{"id": row[0], "asset_tags": row[1], "content_hash": row[2], "cluster_id": row[3]} for row in inserted]
+
+SIGNAL_FIELDS = [
+    "signal_id", "trader_wallet", "exchange", "asset", "direction", "trade_size_usd", "leverage",
+    "catalyst_source", "catalyst_headline", "time_delta_minutes", "ai_confidence_score",
+]
+
+def insert_signals(cur, signals: List[Dict[str, Any]]) -> List[str]:
+    """
+    Persists signals into trading_signals, skipping any signal_id that already exists.
+
+    Returns the signal_ids that were newly created.
+    """
+    if not signals: return []
+    rows = list({s["signal_id"]: tuple(s.get(f) for f in SIGNAL_FIELDS) for s in signals}.values())
+    with timer("db_insert"):
+        inserted = execute_values(
+            cur,
+            """
+            INSERT INTO public.trading_signals (
+                signal_id, trader_id, exchange, asset, direction, trade_size_usd, leverage,
+                catalyst_source, catalyst_headline, time_delta_minutes, ai_confidence_score
+            ) VALUES %s
+            ON CONFLICT (signal_id) DO NOTHING RETURNING signal_id
+            """,
+            rows, page_size=PAGE_SIZE, fetch=True
+        )
+    return [row[0] for row in inserted]
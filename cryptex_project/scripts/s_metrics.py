@@ -0,0 +1,115 @@
+# Lightweight latency instrumentation for the cryptex pipeline.
+# Two histogram families are recorded in-process:
+#   stage  how long each step took (external fetch, DB insert, correlation query,
+#          scoring, Telegram send)
+#   lag    how far an event has travelled along source -> ingested_at -> signal -> alert
+# flush() adds the process's histograms to the cumulative per-job rows in
+# public.pipeline_metric_totals and, when CRYPTEX_METRICS_TEXTFILE is set, rewrites a
+# Prometheus textfile with the totals across jobs.
+import os, time, bisect, threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from psycopg2.extras import execute_values
+from s_db import get_cursor
+
+# Upper bounds in seconds; one extra bucket catches everything above the last bound
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 3600]
+METRIC_NAMES = {"stage": "cryptex_stage_duration_seconds", "lag": "cryptex_event_lag_seconds"}
+LABEL_NAMES = {"stage": "stage", "lag": "hop"}
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+_histograms: Dict[Tuple[str, str], Histogram] = {}
+_lock = threading.Lock()
+
+def observe(kind: str, name: str, seconds: Optional[float]):
+    """Records one observation; None and negative values (clock skew) are ignored."""
+    if seconds is None or seconds < 0: return
+    with _lock:
+        _histograms.setdefault((kind, name), Histogram()).observe(seconds)
+
+def observe_lag(hop: str, start_ts: Optional[float], end_ts: Optional[float] = None):
+    """Records end - start in seconds for epoch timestamps; end defaults to now."""
+    if start_ts is None: return
+    observe("lag", hop, (time.time() if end_ts is None else end_ts) - start_ts)
+
+@contextmanager
+def timer(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage", stage, time.perf_counter() - started)
+
+def snapshot() -> Dict[Tuple[str, str], Histogram]:
+    """Takes and resets the process's histograms."""
+    global _histograms
+    with _lock:
+        taken, _histograms = _histograms, {}
+    return taken
+
+def _render_prometheus(rows: List[Tuple[str, str, int, float, List[int]]]) -> str:
+    lines, declared = [], set()
+    for kind, name, count, total, counts in rows:
+        metric, label = METRIC_NAMES[kind], LABEL_NAMES[kind]
+        if metric not in declared:
+            lines.append(f"# TYPE {metric} histogram")
+            declared.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip([str(b) for b in BUCKETS] + ["+Inf"], counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{{label}="{name}"}} {total}')
+        lines.append(f'{metric}_count{{{label}="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+def export_prometheus(cur, path: str):
+    """Writes the all-time totals from pipeline_metric_totals, summed across jobs, as a node_exporter textfile."""
+    cur.execute("SELECT kind, name, count, sum_seconds, bucket_counts FROM public.pipeline_metric_totals")
+    merged: Dict[Tuple[str, str], list] = {}
+    for kind, name, count, total, counts in cur.fetchall():
+        row = merged.setdefault((kind, name), [0, 0.0, [0] * len(counts)])
+        row[0] += int(count)
+        row[1] += float(total)
+        row[2] = [a + int(b) for a, b in zip(row[2], counts)]
+    rows = [(kind, name, count, total, counts) for (kind, name), (count, total, counts) in sorted(merged.items())]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(_render_prometheus(rows))
+    os.replace(tmp_path, path)
+
+def flush(job: str):
+    """Persists and resets this process's histograms. Never raises: metrics must not break the pipeline."""
+    taken = snapshot()
+    if not taken: return
+    try:
+        with get_cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO public.pipeline_metric_totals (job, kind, name, count, sum_seconds, bucket_counts) VALUES %s
+                ON CONFLICT (job, kind, name) DO UPDATE SET
+                    count = pipeline_metric_totals.count + EXCLUDED.count,
+                    sum_seconds = pipeline_metric_totals.sum_seconds + EXCLUDED.sum_seconds,
+                    bucket_counts = ARRAY(
+                        SELECT COALESCE(a, 0) + COALESCE(b, 0)
+                        FROM unnest(pipeline_metric_totals.bucket_counts, EXCLUDED.bucket_counts) AS u(a, b)
+                    ),
+                    updated_at = NOW()
+                """,
+                [(job, kind, name, h.count, h.sum, h.counts) for (kind, name), h in taken.items()],
+                template="(%s, %s, %s, %s, %s, %s::bigint[])"
+            )
+            textfile = os.environ.get("CRYPTEX_METRICS_TEXTFILE")
+            if textfile: export_prometheus(cur, textfile)
+    except Exception as e:
+        print(f"ERROR: [Metrics] Could not flush metrics for {job}. Error: {e}")
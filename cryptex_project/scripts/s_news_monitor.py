@@ -1,29 +1,119 @@
-import os, requests, json, psycopg2
-from typing import List, Dict, Any
+import os, hashlib
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+import s_http_client as http_client
+from s_db import get_cursor
+from s_ingest import insert_catalysts, drop_known_catalysts
+from s_asset_tagger import get_tagger
+from s_catalyst_clusters import assign_clusters
+from s_metrics import timer, flush
 
-def main() -> List[str]:
+NEWS_SOURCE = "newsapi"
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+MAX_PAGES = 5
+
+def content_hash(article: Dict[str, Any]) -> str:
+    """Stable identity of an article across polls: its URL plus its title."""
+    key = f"{article.get('url') or ''}\n{article.get('title') or ''}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def published_ts(article: Dict[str, Any]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(article["publishedAt"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return None
+
+def get_high_water_mark(cur, source: str) -> Optional[str]:
+    cur.execute("SELECT high_water_mark FROM public.ingest_state WHERE source = %s", (source,))
+    row = cur.fetchone()
+    return row[0].isoformat() if row and row[0] else None
+
+def advance_high_water_mark(cur, source: str, published_at: str):
+    # GREATEST keeps the mark monotonic even if two runs overlap
+    cur.execute(
+        """
+        INSERT INTO public.ingest_state (source, high_water_mark, updated_at) VALUES (%s, %s, NOW())
+        ON CONFLICT (source) DO UPDATE SET
+            high_water_mark = GREATEST(public.ingest_state.high_water_mark, EXCLUDED.high_water_mark),
+            updated_at = NOW()
+        """,
+        (source, published_at)
+    )
+
+def fetch_since(news_api_key: str, high_water_mark: Optional[str], page_size: int, max_pages: int) -> Dict[str, Any]:
+    """
+    Fetches newsapi results back to the mark, newest first. Each request after the first
+    asks for articles up to (`to`) the oldest one fetched so far, so paging never runs into
+    newsapi's cap on how deep `page` may go.
+
+    Returns the articles and whether the mark was reached; if max_pages ran out first,
+    articles between the mark and the oldest one fetched were not seen.
+    """
+    params = {"q": "crypto", "language": "en", "sortBy": "publishedAt", "pageSize": page_size, "apiKey": news_api_key}
+    # 'from' and 'to' are inclusive, so boundary articles are fetched again and dropped by their hash
+    if high_water_mark: params["from"] = high_water_mark
+    mark_ts = published_ts({"publishedAt": high_water_mark}) if high_water_mark else None
+    articles: List[Dict[str, Any]] = []
+    for _ in range(max_pages):
+        with timer("fetch_newsapi"):
+            res = http_client.get(NEWS_API_URL, params=params, timeout=15)
+        res.raise_for_status()
+        batch = res.json().get("articles", [])
+        articles.extend(batch)
+        dated = [(ts, a["publishedAt"]) for a, ts in ((a, published_ts(a)) for a in batch) if ts is not None]
+        # With no mark yet (first run) the newest page is where ingestion starts
+        if len(batch) < page_size or mark_ts is None or not dated or min(dated)[0] <= mark_ts:
+            return {"articles": articles, "complete": True}
+        params["to"] = min(dated)[1]
+    return {"articles": articles, "complete": False}
+
+def main(page_size: int = 100, max_pages: int = MAX_PAGES) -> List[str]:
     print("INFO: [News Monitor] Fetching latest news catalysts...")
-    conn = psycopg2.connect(host='postgres', dbname='windmill', user='windmill', password='windmill')
     news_api_key = os.environ.get("WMILL_SECRET_NEWSAPI_KEY")
     if not news_api_key: raise ValueError("Secret 'NEWSAPI_KEY' is missing.")
-    url = f"https://newsapi.org/v2/everything?q=crypto&language=en&sortBy=publishedAt&pageSize=20&apiKey={news_api_key}"
     inserted_assets = []
     try:
-        res = requests.get(url, timeout=15)
-        res.raise_for_status()
-        articles = res.json().get("articles", [])
-        with conn.cursor() as cur:
-            for article in articles:
-                # In a real system, an AI would extract asset tags from the headline
-                asset_tags = ["BTC", "ETH"] 
-                cur.execute(
-                    "INSERT INTO public.recent_catalysts (headline, source, asset_tags, raw_data) VALUES (%s, %s, %s, %s)",
-                    (article.get('title'), article.get('source', {}).get('name'), asset_tags, json.dumps(article))
-                )
-                inserted_assets.extend(asset_tags)
-        conn.commit()
+        with get_cursor(commit=False) as cur:
+            high_water_mark = get_high_water_mark(cur, NEWS_SOURCE)
+        fetched = fetch_since(news_api_key, high_water_mark, page_size, max_pages)
+        articles = fetched["articles"]
+        tags_per_article = get_tagger().tag_batch(
+            [f"{a.get('title') or ''}\n{a.get('description') or ''}" for a in articles]
+        )
+        catalyst_events = []
+        for article, tags in zip(articles, tags_per_article):
+            # Untagged articles can never correlate with a trade, so they are not stored
+            if not tags: continue
+            asset_tags = sorted(tags)
+            catalyst_events.append({
+                "headline": article.get('title'),
+                "source": article.get('source', {}).get('name'),
+                "asset_tags": asset_tags,
+                # Match strengths let the scorer tell "$SOL" in a headline from a passing mention
+                "raw_data": {**article, "asset_tag_strength": tags, "event_ts": published_ts(article)},
+                "content_hash": content_hash(article),
+            })
+        published = [a["publishedAt"] for a in articles if published_ts(a) is not None]
+        new_mark = None
+        if fetched["complete"]:
+            if published: new_mark = max(published, key=lambda p: published_ts({"publishedAt": p}))
+        else:
+            # The unseen articles lie between the old mark and the oldest one fetched; keeping
+            # the mark makes the next run page back to them (fetched ones dedup by hash)
+            print(f"ERROR: [News Monitor] {max_pages} request(s) did not reach the high-water mark; keeping it at {high_water_mark}.")
+        # Inserts and the new mark commit together, so a failed run is simply retried
+        with get_cursor() as cur:
+            # Articles already stored (the inclusive 'from' re-fetches some) must not touch the clusters again
+            catalyst_events = drop_known_catalysts(cur, catalyst_events)
+            # Syndicated copies of one story share a cluster_id, so correlation sees the story once
+            clusters = assign_clusters(cur, catalyst_events)
+            inserted = insert_catalysts(cur, catalyst_events)
+            if new_mark: advance_high_water_mark(cur, NEWS_SOURCE, new_mark)
+        print(f"INFO: [News Monitor] Fetched {len(articles)} article(s), {len(inserted)} new, "
+              f"{clusters['created']} new story cluster(s), {clusters['joined']} near-duplicate(s).")
+        for row in inserted:
+            inserted_assets.extend(row["asset_tags"])
     except Exception as e:
         print(f"ERROR: [News Monitor] Could not fetch news. Error: {e}")
-    finally:
-        conn.close()
-    return list(set(inserted_assets)) # Return unique list of assets found
\ No newline at end of file
+    flush("news_monitor")
+    return list(set(inserted_assets)) # Return unique list of assets found
@@ -0,0 +1,129 @@
+# Keeps the hourly partitions of recent_trades and recent_catalysts rotating.
+# Pre-creates the next few hours so inserts never land in the default partition,
+# and drops (or detaches) partitions that are entirely older than the retention.
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+from psycopg2 import sql
+from s_db import get_cursor
+from s_asset_aggregates import prune_aggregates
+from s_catalyst_clusters import prune_clusters
+
+PARTITIONED_TABLES = ["recent_trades", "recent_catalysts"]
+PARTITION_SUFFIX_FORMAT = "%Y%m%d%H"
+
+LIST_PARTITIONS_QUERY = """
+SELECT c.relname FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_class p ON p.oid = i.inhparent
+JOIN pg_namespace n ON n.oid = p.relnamespace
+WHERE n.nspname = 'public' AND p.relname = %s;
+"""
+
+def partition_name(table: str, hour_start: datetime) -> str:
+    return f"{table}_p{hour_start.strftime(PARTITION_SUFFIX_FORMAT)}"
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+def partition_start(table: str, name: str) -> Optional[datetime]:
+    """Parses the hour a partition covers from its name; None for the default partition or foreign names."""
+    prefix = f"{table}_p"
+    if not name.startswith(prefix): return None
+    try:
+        return datetime.strptime(name[len(prefix):], PARTITION_SUFFIX_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def ensure_partitions(cur, table: str, now: datetime, precreate_hours: int) -> List[str]:
+    """
+    Creates hourly partitions from the current hour through `precreate_hours` ahead.
+    Rows that already landed in the default partition for one of those hours are moved
+    into the new partition (see public.ensure_hour_partition in s_db_init.sql).
+    """
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    created = []
+    for offset in range(precreate_hours + 1):
+        cur.execute("SELECT public.ensure_hour_partition(%s, %s)", (table, current_hour + timedelta(hours=offset)))
+        created.append(cur.fetchone()[0])
+    return created
+
+def expire_partitions(cur, table: str, now: datetime, retention_hours: int, detach_only: bool) -> List[str]:
+    """Drops or detaches every partition whose whole hour is older than the retention cutoff."""
+    cutoff = now - timedelta(hours=retention_hours)
+    cur.execute(LIST_PARTITIONS_QUERY, (table,))
+    expired = []
+    for (name,) in cur.fetchall():
+        start = partition_start(table, name)
+        if start is None or start + timedelta(hours=1) > cutoff: continue
+        if detach_only:
+            cur.execute(sql.SQL("ALTER TABLE public.{} DETACH PARTITION public.{}").format(
+                sql.Identifier(table), sql.Identifier(name)))
+        else:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS public.{}").format(sql.Identifier(name)))
+        expired.append(name)
+    return expired
+
+def prune_default_partition(cur, table: str, now: datetime, retention_hours: int) -> int:
+    """Deletes expired rows from the default partition, which expire_partitions never drops."""
+    cur.execute(
+        sql.SQL("DELETE FROM public.{} WHERE ingested_at < %s").format(sql.Identifier(default_partition_name(table))),
+        (now - timedelta(hours=retention_hours),)
+    )
+    return cur.rowcount
+
+def prune_fingerprints(cur, now: datetime, fingerprint_retention_hours: int) -> int:
+    """Forgets catalyst content hashes once no source could plausibly return the article again."""
+    cur.execute("DELETE FROM public.catalyst_fingerprints WHERE first_seen_at < %s",
+                (now - timedelta(hours=fingerprint_retention_hours),))
+    return cur.rowcount
+
+def main(retention_hours: int = 1, precreate_hours: int = 3, detach_only: bool = False,
+         fingerprint_retention_hours: int = 72, cluster_retention_hours: int = 24) -> Dict[str, Any]:
+    """
+    Rotates the partitions of every event table.
+
+    Args:
+        retention_hours: How many whole hours of history to keep.
+        precreate_hours: How many hours ahead to create partitions for.
+        detach_only: Detach expired partitions instead of dropping them, e.g. to archive them.
+        fingerprint_retention_hours: How long catalyst content hashes are kept for dedup.
+        cluster_retention_hours: How long a story cluster survives without a new copy.
+
+    Returns:
+        The partitions ensured and expired and the default-partition rows pruned per table
+        (a failed step is reported as "<step>_error"), plus the number of pruned fingerprints,
+        story clusters and aggregate buckets.
+    """
+    now = datetime.now(timezone.utc)
+    report = {}
+    for table in PARTITIONED_TABLES:
+        # Separate transactions per table and step, so a failure in one does not roll back the others
+        steps = [
+            ("ensured", lambda cur: ensure_partitions(cur, table, now, precreate_hours)),
+            ("expired", lambda cur: expire_partitions(cur, table, now, retention_hours, detach_only)),
+            ("pruned_default_rows", lambda cur: prune_default_partition(cur, table, now, retention_hours)),
+        ]
+        report[table] = {}
+        for step, run in steps:
+            try:
+                with get_cursor() as cur:
+                    report[table][step] = run(cur)
+            except Exception as e:
+                print(f"ERROR: [Partition Maintenance] {table}: {step} step failed. Error: {e}")
+                report[table][f"{step}_error"] = str(e)
+        print(f"INFO: [Partition Maintenance] {table}: ensured {len(report[table].get('ensured', []))}, "
+              f"expired {len(report[table].get('expired', []))} partition(s), "
+              f"pruned {report[table].get('pruned_default_rows', 0)} default-partition row(s).")
+    try:
+        with get_cursor() as cur:
+            report["pruned_fingerprints"] = prune_fingerprints(cur, now, fingerprint_retention_hours)
+            report["pruned_clusters"] = prune_clusters(cur, now, cluster_retention_hours)
+    except Exception as e:
+        print(f"ERROR: [Partition Maintenance] Could not prune catalyst fingerprints or clusters. Error: {e}")
+    try:
+        # Aggregate buckets outlive the raw partitions: the 24h window needs a day of them
+        with get_cursor() as cur:
+            report["pruned_aggregate_buckets"] = prune_aggregates(cur, now)
+    except Exception as e:
+        print(f"ERROR: [Partition Maintenance] Could not prune asset aggregates. Error: {e}")
+    return report
@@ -0,0 +1,142 @@
+# Turns repeated full position lists into position change events.
+# The last seen position per (trader_id, symbol) lives in cex_position_snapshots;
+# each poll is diffed against it so only opens, closes, increases, decreases and
+# flips are ingested into recent_trades. The first poll of a trader only records the
+# baseline: positions held before we started following them are not fresh trades.
+# In hedge mode a symbol can be held long and short at once; the legs are netted per
+# symbol, so changes are reported against the trader's net exposure.
+from typing import List, Dict, Any, Optional
+from psycopg2.extras import execute_values
+from s_db import get_cursor
+from s_ingest import insert_trades
+
+QUOTE_SUFFIXES = ("USDT", "BUSD", "USDC", "USD")
+SIZE_EPSILON = 1e-12
+
+def symbol_to_asset(symbol: str) -> str:
+    """Maps a futures symbol like BTCUSDT to the base asset BTC used in catalyst tags."""
+    symbol = (symbol or "").upper()
+    for suffix in QUOTE_SUFFIXES:
+        if symbol.endswith(suffix) and len(symbol) > len(suffix):
+            return symbol[:-len(suffix)]
+    return symbol
+
+def _float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _direction(amount: float) -> str:
+    return "LONG" if amount > 0 else "SHORT"
+
+def _classify(previous_amount: float, amount: float) -> Optional[str]:
+    if abs(amount - previous_amount) <= SIZE_EPSILON: return None
+    if abs(previous_amount) <= SIZE_EPSILON: return "open"
+    if abs(amount) <= SIZE_EPSILON: return "close"
+    if (previous_amount > 0) != (amount > 0): return "flip"
+    return "increase" if abs(amount) > abs(previous_amount) else "decrease"
+
+def net_positions(positions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """symbol -> one position, summing the signed amounts of hedge-mode legs on the same symbol."""
+    netted: Dict[str, Dict[str, Any]] = {}
+    for p in positions:
+        symbol = p.get("symbol")
+        if not symbol: continue
+        if symbol not in netted:
+            netted[symbol] = dict(p)
+            continue
+        merged = netted[symbol]
+        merged["amount"] = _float(merged.get("amount")) + _float(p.get("amount"))
+        merged["leverage"] = max(_float(merged.get("leverage")), _float(p.get("leverage")))
+        if _float(p.get("updateTimeStamp")) > _float(merged.get("updateTimeStamp")):
+            merged["updateTimeStamp"], merged["markPrice"] = p.get("updateTimeStamp"), p.get("markPrice")
+    return netted
+
+def diff_positions(previous: Dict[str, Dict[str, float]], positions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Compares a fetched position list against the previous snapshot.
+
+    Args:
+        previous: symbol -> {"amount", "leverage"} from the last snapshot; amount is signed (negative = short).
+        positions: The leaderboard's current otherPositionRetList; hedge-mode legs are netted per symbol.
+
+    Returns:
+        One change event per symbol whose size changed, with size and leverage deltas.
+    """
+    events = []
+    current = net_positions(positions)
+    for symbol in list(current) + [s for s in previous if s not in current]:
+        pos = current.get(symbol, {})
+        before = previous.get(symbol, {})
+        amount = _float(pos.get("amount"))
+        previous_amount = _float(before.get("amount"))
+        event_type = _classify(previous_amount, amount)
+        if event_type is None: continue
+        leverage = _float(pos.get("leverage"), _float(before.get("leverage")))
+        size_delta = amount - previous_amount
+        mark_price = _float(pos.get("markPrice"), _float(before.get("mark_price")))
+        update_ms = pos.get("updateTimeStamp")
+        events.append({
+            "exchange": "Binance",
+            "event_type": event_type,
+            "symbol": symbol,
+            # A close reports the side that was closed; everything else the resulting side
+            "direction": _direction(previous_amount if event_type == "close" else amount),
+            "amount": amount,
+            "previous_amount": previous_amount,
+            "size_delta": size_delta,
+            "leverage": leverage,
+            "leverage_delta": leverage - _float(before.get("leverage"), leverage),
+            "mark_price": mark_price,
+            "notional_usd": abs(size_delta) * mark_price,
+            "event_ts": update_ms / 1000.0 if isinstance(update_ms, (int, float)) else None,
+            "raw_pos": pos or None,
+        })
+    return events
+
+def load_snapshot(cur, trader_id: str) -> Optional[Dict[str, Dict[str, float]]]:
+    """The trader's last snapshot, or None when they have no baseline yet."""
+    # FOR UPDATE serialises overlapping polls of the same trader
+    cur.execute("SELECT 1 FROM public.cex_position_baselines WHERE trader_id = %s FOR UPDATE", (trader_id,))
+    if cur.fetchone() is None: return None
+    cur.execute(
+        "SELECT symbol, amount, leverage, mark_price FROM public.cex_position_snapshots WHERE trader_id = %s FOR UPDATE",
+        (trader_id,)
+    )
+    return {symbol: {"amount": float(amount), "leverage": _float(leverage), "mark_price": _float(mark_price)}
+            for symbol, amount, leverage, mark_price in cur.fetchall()}
+
+def save_snapshot(cur, trader_id: str, positions: List[Dict[str, Any]]):
+    rows = [(trader_id, symbol, _float(p.get("amount")), _float(p.get("leverage")), _float(p.get("markPrice")))
+            for symbol, p in net_positions(positions).items()]
+    cur.execute(
+        "INSERT INTO public.cex_position_baselines (trader_id) VALUES (%s) ON CONFLICT DO NOTHING", (trader_id,)
+    )
+    cur.execute(
+        "DELETE FROM public.cex_position_snapshots WHERE trader_id = %s AND NOT (symbol = ANY(%s))",
+        (trader_id, [row[1] for row in rows])
+    )
+    if not rows: return
+    execute_values(
+        cur,
+        """
+        INSERT INTO public.cex_position_snapshots (trader_id, symbol, amount, leverage, mark_price) VALUES %s
+        ON CONFLICT (trader_id, symbol) DO UPDATE SET
+            amount = EXCLUDED.amount, leverage = EXCLUDED.leverage,
+            mark_price = EXCLUDED.mark_price, updated_at = NOW()
+        """,
+        rows
+    )
+
+def ingest_position_changes(trader_id: str, positions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Diffs, ingests the change events and advances the snapshot in one transaction."""
+    with get_cursor() as cur:
+        previous = load_snapshot(cur, trader_id)
+        if previous is None:
+            print(f"INFO: [Position Snapshots] {trader_id}: first poll, recording {len(positions)} position(s) as the baseline.")
+        events = diff_positions(previous, positions) if previous is not None else []
+        trade_events = [{"trader_id": trader_id, "asset": symbol_to_asset(e["symbol"]), "raw_data": e} for e in events]
+        insert_trades(cur, trade_events)
+        save_snapshot(cur, trader_id, positions)
+    return trade_events
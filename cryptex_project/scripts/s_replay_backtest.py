@@ -0,0 +1,198 @@
+# Replays recorded trades and catalysts through the correlation pipeline on a
+# virtual clock, to measure throughput, signal counts and trade-to-signal latency
+# without live APIs.
+#
+# Input is JSONL or CSV, one event per line/row:
+#   type        "trade" or "catalyst"
+#   ts          original event time, ISO 8601 or epoch seconds
+#   asset       trades only
+#   asset_tags  catalysts only; a JSON list, or "BTC|ETH" in CSV
+#   trader_id, headline, source, raw_data (JSON object) are optional
+#
+# Backends:
+#   memory    s_streaming_correlator as an in-process stand-in for Postgres
+#   postgres  s_ingest + s_correlation_engine.correlate_batch against the database
+#             that CRYPTEX_DB_* points at. Use a scratch database: events are written
+#             with their virtual timestamps as ingested_at. The hourly partitions for
+#             the recording's span are created first, so replayed rows land in their
+#             own partitions instead of the default one.
+import csv, json, time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable
+from s_streaming_correlator import StreamingCorrelator
+
+def _parse_ts(value: Any) -> float:
+    if isinstance(value, (int, float)): return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+def _normalize(record: Dict[str, Any]) -> Dict[str, Any]:
+    raw_data = record.get("raw_data") or {}
+    if isinstance(raw_data, str): raw_data = json.loads(raw_data) if raw_data.strip() else {}
+    tags = record.get("asset_tags") or []
+    if isinstance(tags, str): tags = json.loads(tags) if tags.startswith("[") else [t for t in tags.split("|") if t]
+    ts = _parse_ts(record["ts"])
+    return {
+        "type": record.get("type"),
+        "ts": ts,
+        "asset": record.get("asset") or None,
+        "asset_tags": tags,
+        "trader_id": record.get("trader_id") or "replay",
+        "headline": record.get("headline"),
+        "source": record.get("source"),
+        # event_ts travels with the event so signals can be traced back to their source time
+        "raw_data": {**raw_data, "event_ts": ts},
+    }
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    """Loads a JSONL or CSV recording and returns its events sorted by original time."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            records: Iterable[Dict[str, Any]] = csv.DictReader(f)
+            events = [_normalize(r) for r in records]
+        else:
+            events = [_normalize(json.loads(line)) for line in f if line.strip()]
+    return sorted((e for e in events if e["type"] in ("trade", "catalyst")), key=lambda e: e["ts"])
+
+class VirtualClock:
+    """Maps wall time onto recorded time, running `speedup` times faster than real time."""
+    def __init__(self, start_ts: float, speedup: float):
+        self.start_ts = start_ts
+        self.speedup = speedup
+        self.wall_start = time.monotonic()
+
+    def now(self) -> float:
+        return self.start_ts + (time.monotonic() - self.wall_start) * self.speedup
+
+    def sleep_until(self, ts: float):
+        delay = (ts - self.now()) / self.speedup
+        if delay > 0: time.sleep(delay)
+
+class MemoryBackend:
+    def __init__(self):
+        self.correlator = StreamingCorrelator()
+
+    def prepare(self, events: List[Dict[str, Any]]):
+        pass
+
+    def process(self, events: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        signals = []
+        for e in events:
+            if e["type"] == "trade":
+                signals.extend(self.correlator.add_trade(e["asset"], e["raw_data"], e["ts"]))
+            else:
+                signals.extend(self.correlator.add_catalyst(e["asset_tags"], e["raw_data"], e["ts"]))
+        return signals
+
+class PostgresBackend:
+    def __init__(self):
+        self.seen_signal_ids = set()
+
+    def prepare(self, events: List[Dict[str, Any]]):
+        """Creates the hourly partitions from the first event's hour through the last one's."""
+        from s_db import get_cursor
+        from s_partition_maintenance import PARTITIONED_TABLES, ensure_partitions
+        start = datetime.fromtimestamp(events[0]["ts"], timezone.utc)
+        span_hours = int((events[-1]["ts"] - start.replace(minute=0, second=0, microsecond=0).timestamp()) // 3600)
+        for table in PARTITIONED_TABLES:
+            with get_cursor() as cur:
+                ensure_partitions(cur, table, start, span_hours)
+
+    def process(self, events: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        from s_db import get_cursor
+        from s_ingest import insert_trades, insert_catalysts
+        from s_correlation_engine import correlate_batch
+        trades = [{**e, "ingested_at": datetime.fromtimestamp(e["ts"], timezone.utc)} for e in events if e["type"] == "trade"]
+        catalysts = [{**e, "ingested_at": datetime.fromtimestamp(e["ts"], timezone.utc)} for e in events if e["type"] == "catalyst"]
+        assets = list(dict.fromkeys([e["asset"] for e in trades] + [t for e in catalysts for t in e["asset_tags"]]))
+        with get_cursor() as cur:
+            insert_trades(cur, trades)
+            insert_catalysts(cur, catalysts)
+            grouped = correlate_batch(cur, assets, as_of=datetime.fromtimestamp(now, timezone.utc))
+        signals = []
+        for asset_signals in grouped.values():
+            for s in asset_signals:
+                if s["signal_id"] in self.seen_signal_ids: continue
+                self.seen_signal_ids.add(s["signal_id"])
+                signals.append(s)
+        return signals
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values: return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+def replay(events: List[Dict[str, Any]], speedup: float = 100.0, backend: str = "memory",
+           tick_seconds: float = 1.0) -> Dict[str, Any]:
+    """
+    Feeds events through a backend in virtual-time ticks of `tick_seconds`.
+
+    Trade-to-signal latency is measured in virtual seconds from the trade's original
+    time to the tick in which its signal was produced.
+    """
+    runner = MemoryBackend() if backend == "memory" else PostgresBackend()
+    if not events: return {"events": 0, "signals": 0}
+    runner.prepare(events)
+    clock = VirtualClock(events[0]["ts"], speedup)
+    trade_to_signal, processing_ms, signal_count, i = [], [], 0, 0
+    wall_start = time.monotonic()
+    while i < len(events):
+        tick_end = events[i]["ts"] + tick_seconds
+        batch = []
+        while i < len(events) and events[i]["ts"] < tick_end:
+            batch.append(events[i])
+            i += 1
+        clock.sleep_until(batch[-1]["ts"])
+        started = time.monotonic()
+        # Correlate as of the last replayed event, not the virtual clock: at high speedups
+        # the clock runs ahead of the batch and would make windowed results vary per run
+        signals = runner.process(batch, batch[-1]["ts"])
+        processing_ms.append((time.monotonic() - started) * 1000)
+        detected_at = clock.now()
+        signal_count += len(signals)
+        for s in signals:
+            trade_ts = (s.get("trade") or {}).get("event_ts")
+            if trade_ts is not None: trade_to_signal.append(detected_at - trade_ts)
+    wall_seconds = time.monotonic() - wall_start
+    return {
+        "backend": backend,
+        "speedup": speedup,
+        "events": len(events),
+        "signals": signal_count,
+        "virtual_seconds": round(events[-1]["ts"] - events[0]["ts"], 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_events_per_second": round(len(events) / wall_seconds, 1) if wall_seconds else None,
+        "trade_to_signal_seconds": _percentiles(trade_to_signal),
+        "tick_processing_ms": _percentiles(processing_ms),
+    }
+
+def main(path: str, speedup: float = 100.0, backend: str = "memory", tick_seconds: float = 1.0) -> Dict[str, Any]:
+    """
+    Replays a recording and reports throughput, signal counts and latency distributions.
+
+    Args:
+        path: JSONL or CSV recording of trades and catalysts.
+        speedup: Virtual clock speed relative to real time, e.g. 10 to 1000.
+        backend: "memory" for the in-process stand-in, "postgres" for the real query path.
+        tick_seconds: Virtual seconds of events ingested and correlated together.
+    """
+    events = load_events(path)
+    print(f"INFO: [Replay] Replaying {len(events)} event(s) from {path} at {speedup}x on the {backend} backend.")
+    report = replay(events, speedup, backend, tick_seconds)
+    print(f"INFO: [Replay] {json.dumps(report)}")
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay recorded cryptex events through the correlation pipeline.")
+    parser.add_argument("path")
+    parser.add_argument("--speedup", type=float, default=100.0)
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--tick-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    main(args.path, args.speedup, args.backend, args.tick_seconds)
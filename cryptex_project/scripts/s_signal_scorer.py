@@ -0,0 +1,79 @@
+# Heuristic confidence scoring for candidate trade/catalyst pairs.
+# All candidates of a correlation run are scored in one vectorized NumPy pass, so only
+# signals above the threshold reach the expensive enrichment and alerting steps.
+import os, math
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
+import numpy as np
+import yaml
+
+DEFAULT_CONFIG_PATH = os.environ.get(
+    "CRYPTEX_SIGNAL_SCORING",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "signal_scoring.yaml")
+)
+FEATURES = ["time_proximity", "notional", "leverage", "source", "tag_match", "crowding"]
+
+@lru_cache(maxsize=None)
+def load_config(path: str = DEFAULT_CONFIG_PATH) -> Dict[str, Any]:
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+def _column(signals: List[Dict[str, Any]], key: str) -> np.ndarray:
+    values = []
+    for s in signals:
+        try:
+            values.append(float(s.get(key)))
+        except (TypeError, ValueError):
+            values.append(np.nan)
+    return np.array(values, dtype=float)
+
+def _tag_strength(signal: Dict[str, Any]) -> float:
+    catalyst = signal.get("catalyst") or {}
+    strengths = catalyst.get("asset_tag_strength")
+    if isinstance(strengths, dict) and signal.get("asset") in strengths:
+        # A headline naming one asset is more specific than one listing five
+        return float(strengths[signal["asset"]]) / math.sqrt(len(strengths))
+    return 0.5
+
+def _same_side_traders(signal: Dict[str, Any], window: str) -> float:
+    # Other traders moving the same way on this asset; the signal's own trader is not counted
+    flow = ((signal.get("context") or {}).get(window)) or {}
+    key = {"LONG": "long_traders", "SHORT": "short_traders"}.get(signal.get("direction"))
+    return max(0.0, float(flow.get(key, 0)) - 1.0) if key else 0.0
+
+def feature_matrix(signals: List[Dict[str, Any]], config: Dict[str, Any]) -> np.ndarray:
+    """Builds an (n_signals, n_features) matrix of features normalized to 0..1; missing data scores 0."""
+    source_weights = config.get("source_weights") or {}
+    default_source = float(config.get("default_source_weight", 0.5))
+    delta = _column(signals, "time_delta_minutes")
+    notional = _column(signals, "trade_size_usd")
+    leverage = _column(signals, "leverage")
+    source = np.array([float(source_weights.get(s.get("catalyst_source"), default_source)) for s in signals])
+    tag_match = np.array([_tag_strength(s) for s in signals])
+    crowd_window = config.get("crowding_window", "1h")
+    crowding = np.array([_same_side_traders(s, crowd_window) for s in signals])
+
+    time_proximity = np.exp(-delta / float(config.get("time_decay_minutes", 2.0)))
+    notional_score = np.log10(np.abs(notional) + 1.0) / math.log10(float(config.get("notional_reference_usd", 1e6)) + 1.0)
+    leverage_score = leverage / float(config.get("leverage_reference", 50))
+    crowding_score = crowding / float(config.get("crowding_reference_traders", 2))
+    matrix = np.column_stack([time_proximity, notional_score, leverage_score, source, tag_match, crowding_score])
+    return np.clip(np.nan_to_num(matrix, nan=0.0), 0.0, 1.0)
+
+def score(signals: List[Dict[str, Any]], config: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """Returns an integer 0..100 confidence per signal."""
+    if not signals: return np.zeros(0, dtype=int)
+    config = config or load_config()
+    weights = np.array([float((config.get("weights") or {}).get(f, 0.0)) for f in FEATURES])
+    total = weights.sum() or 1.0
+    return np.rint(feature_matrix(signals, config) @ weights / total * 100).astype(int)
+
+def score_signals(signals: List[Dict[str, Any]], config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Fills ai_confidence_score on every signal in place and returns them."""
+    for signal, value in zip(signals, score(signals, config)):
+        signal["ai_confidence_score"] = int(value)
+    return signals
+
+def filter_confident(signals: List[Dict[str, Any]], min_confidence: Optional[int] = None) -> List[Dict[str, Any]]:
+    if min_confidence is None: min_confidence = int(load_config().get("min_confidence", 0))
+    return [s for s in signals if (s.get("ai_confidence_score") or 0) >= min_confidence]
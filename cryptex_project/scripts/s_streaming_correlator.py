@@ -0,0 +1,158 @@
+# Long-lived, in-memory alternative to re-querying Postgres every tick.
+# Keeps per-asset, time-ordered windows of trades and catalysts and matches each
+# new event only against the opposite window of its asset, found by binary search on
+# time, so work is O(log n + matches) per event.
+# A trade and a catalyst match when their timestamps are at most window_seconds apart,
+# in either order. Events are kept for grace_seconds beyond the window behind the latest
+# one, so a straggler arriving up to that late still finds its partner; stragglers later
+# than that are dropped.
+import os, json, time
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Optional, Tuple
+
+WINDOW_SECONDS = 5 * 60
+GRACE_SECONDS = 60
+DEFAULT_CHECKPOINT_PATH = os.environ.get("CRYPTEX_CORRELATOR_CHECKPOINT", "/tmp/cryptex_correlator_state.json")
+
+class TimeWindow:
+    """Events of one asset sorted by timestamp; evicted entries are dropped from the front in batches."""
+    def __init__(self, entries: Optional[List[Tuple[float, Any]]] = None):
+        entries = sorted(entries or [], key=lambda e: e[0])
+        self.ts: List[float] = [e[0] for e in entries]
+        self.items: List[Any] = [e[1] for e in entries]
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.ts) - self.head
+
+    def add(self, ts: float, item: Any):
+        # Events normally arrive in order; stragglers take a binary-searched insert
+        if not self.ts or self.ts[-1] <= ts:
+            self.ts.append(ts)
+            self.items.append(item)
+            return
+        i = bisect_right(self.ts, ts, self.head)
+        self.ts.insert(i, ts)
+        self.items.insert(i, item)
+
+    def between(self, start: float, end: float) -> List[Any]:
+        return self.items[bisect_left(self.ts, start, self.head):bisect_right(self.ts, end, self.head)]
+
+    def evict_before(self, cutoff: float):
+        """Drops entries at or before cutoff; the backing lists are compacted once half of them is dead."""
+        self.head = bisect_right(self.ts, cutoff, self.head)
+        if self.head and self.head * 2 >= len(self.ts):
+            del self.ts[:self.head], self.items[:self.head]
+            self.head = 0
+
+    def entries(self) -> List[Tuple[float, Any]]:
+        return list(zip(self.ts[self.head:], self.items[self.head:]))
+
+class StreamingCorrelator:
+    def __init__(self, window_seconds: float = WINDOW_SECONDS, grace_seconds: float = GRACE_SECONDS):
+        self.window_seconds = window_seconds
+        self.grace_seconds = grace_seconds
+        self.trades: Dict[str, TimeWindow] = {}
+        self.catalysts: Dict[str, TimeWindow] = {}
+        # Latest event time seen; eviction is driven by event time, not the wall clock
+        self.last_ts = 0.0
+
+    @property
+    def horizon(self) -> float:
+        """Oldest event time still kept: the window plus the grace period behind the latest event."""
+        return self.last_ts - self.window_seconds - self.grace_seconds
+
+    def _evict(self, windows: Dict[str, TimeWindow], asset: str) -> TimeWindow:
+        window = windows.setdefault(asset, TimeWindow())
+        window.evict_before(self.horizon)
+        return window
+
+    def _admit(self, ts: float) -> bool:
+        """Advances event time; False for a straggler whose partners may already be evicted."""
+        if ts < self.horizon: return False
+        self.last_ts = max(self.last_ts, ts)
+        return True
+
+    def _within(self, window: TimeWindow, ts: float) -> List[Any]:
+        """Entries no more than window_seconds from ts, earlier or later (stragglers can sit on either side)."""
+        return window.between(ts - self.window_seconds, ts + self.window_seconds)
+
+    def add_trade(self, asset: str, raw_data: Any, ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Adds a trade and returns a signal for every catalyst tagged with its asset within the window of it."""
+        ts = time.time() if ts is None else ts
+        if not asset or not self._admit(ts): return []
+        catalysts = self._evict(self.catalysts, asset)
+        self._evict(self.trades, asset).add(ts, raw_data)
+        return [{"trade": raw_data, "catalyst": catalyst} for catalyst in self._within(catalysts, ts)]
+
+    def add_catalyst(self, asset_tags: List[str], raw_data: Any, ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Adds a catalyst and returns a signal for every trade in its tagged assets within the window of it."""
+        ts = time.time() if ts is None else ts
+        if not self._admit(ts): return []
+        signals = []
+        for asset in dict.fromkeys(asset_tags or []):
+            trades = self._evict(self.trades, asset)
+            self._evict(self.catalysts, asset).add(ts, raw_data)
+            signals.extend({"trade": trade, "catalyst": raw_data} for trade in self._within(trades, ts))
+        return signals
+
+    def evict_expired(self, now: Optional[float] = None):
+        """Drops expired entries for every asset, including ones that have gone quiet."""
+        now = (self.last_ts or time.time()) if now is None else now
+        cutoff = now - self.window_seconds - self.grace_seconds
+        for windows in (self.trades, self.catalysts):
+            for asset in list(windows):
+                windows[asset].evict_before(cutoff)
+                if not windows[asset]:
+                    del windows[asset]
+
+    def checkpoint(self, path: str = DEFAULT_CHECKPOINT_PATH):
+        """Writes the live windows atomically so a restart can pick up where it left off."""
+        self.evict_expired()
+        state = {
+            "window_seconds": self.window_seconds,
+            "last_ts": self.last_ts,
+            "trades": {a: w.entries() for a, w in self.trades.items()},
+            "catalysts": {a: w.entries() for a, w in self.catalysts.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def restore(cls, path: str = DEFAULT_CHECKPOINT_PATH, window_seconds: float = WINDOW_SECONDS) -> "StreamingCorrelator":
+        """Loads a checkpoint if one exists, otherwise starts with empty windows."""
+        correlator = cls(window_seconds)
+        if not os.path.exists(path): return correlator
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: [Streaming Correlator] Ignoring unreadable checkpoint {path}. Error: {e}")
+            return correlator
+        correlator.last_ts = state.get("last_ts", 0.0)
+        correlator.trades = {a: TimeWindow([tuple(e) for e in w]) for a, w in state.get("trades", {}).items()}
+        correlator.catalysts = {a: TimeWindow([tuple(e) for e in w]) for a, w in state.get("catalysts", {}).items()}
+        correlator.evict_expired()
+        return correlator
+
+def main(events: List[Dict[str, Any]], checkpoint_path: str = DEFAULT_CHECKPOINT_PATH) -> List[Dict[str, Any]]:
+    """
+    Feeds a batch of events through the correlator and checkpoints its state.
+
+    Each event is {"type": "trade", "asset": ..., "raw_data": ..., "ts": ...} or
+    {"type": "catalyst", "asset_tags": [...], "raw_data": ..., "ts": ...}; "ts" is
+    epoch seconds and defaults to now. Returns the same {"trade", "catalyst"} signal
+    dicts as s_correlation_engine.main.
+    """
+    correlator = StreamingCorrelator.restore(checkpoint_path)
+    signals = []
+    for event in events:
+        if event.get("type") == "trade":
+            signals.extend(correlator.add_trade(event.get("asset"), event.get("raw_data"), event.get("ts")))
+        elif event.get("type") == "catalyst":
+            signals.extend(correlator.add_catalyst(event.get("asset_tags"), event.get("raw_data"), event.get("ts")))
+    correlator.checkpoint(checkpoint_path)
+    print(f"INFO: [Streaming Correlator] Processed {len(events)} event(s), found {len(signals)} signal(s).")
+    return signals
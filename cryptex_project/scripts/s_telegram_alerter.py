@@ -1,7 +1,27 @@
 # File: s_telegram_alerter.py
 # This script is now correctly linked to the cryptex-specific Telegram secrets.
 import os
-import requests
+import s_http_client as http_client
+
+def _fmt(value, spec: str = "", fallback: str = "n/a") -> str:
+    return fallback if value is None else format(value, spec)
+
+def format_context(signal: dict, window: str = "1h") -> str:
+    """One line of rolling flow for the signal's asset, or "" when the engine attached none."""
+    flow = (signal.get("context") or {}).get(window)
+    if not flow: return ""
+    return f"**Flow ({window}):** `{flow['long_traders']}` long / `{flow['short_traders']}` short trader(s), " \
+           f"net `${flow['net_notional_usd']:,.0f}`, `{flow['catalyst_count']}` catalyst(s)\n\n"
+
+def format_signal(signal: dict) -> str:
+    """Renders one signal as the Markdown alert text; missing fields show as n/a."""
+    return f"🚨 **Cryptex Signal Detected** 🚨\n\n" \
+           f"**Trader:** `{_fmt(signal.get('trader_wallet'))}` on *{_fmt(signal.get('exchange'))}*\n" \
+           f"**Trade:** `{_fmt(signal.get('direction'))}` **{_fmt(signal.get('asset'))}**\n" \
+           f"**Size:** `${_fmt(signal.get('trade_size_usd'), ',.2f')}` at `{_fmt(signal.get('leverage'))}x` leverage\n\n" \
+           f"**Catalyst:** {_fmt(signal.get('catalyst_headline'))}\n\n" \
+           f"{format_context(signal)}" \
+           f"**Confidence:** `{_fmt(signal.get('ai_confidence_score'))}%`"
 
 def main(signal: dict):
     if not signal:
@@ -18,18 +38,13 @@ def main(signal: dict):
     if not all([bot_token, chat_id]):
         raise ValueError("Cryptex Telegram secrets are missing. Please set them in the Windmill UI.")
 
-    message = f"🚨 **Cryptex Signal Detected** 🚨\n\n" \
-              f"**Trader:** `{signal['trader_wallet']}` on *{signal['exchange']}*\n" \
-              f"**Trade:** `{signal['direction']}` **{signal['asset']}**\n" \
-              f"**Size:** `${signal['trade_size_usd']:,.2f}` at `{signal['leverage']}x` leverage\n\n" \
-              f"**Catalyst:** {signal['catalyst_headline']}\n\n" \
-              f"**Confidence:** `{signal['ai_confidence_score']}%`"
+    message = format_signal(signal)
 
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
     payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
 
     try:
-        res = requests.post(url, json=payload, timeout=10)
+        res = http_client.post(url, json=payload, timeout=10)
         res.raise_for_status()
         print("INFO: [Cryptex-Alerter] Telegram alert sent successfully.")
         return {"status": "alert_sent"}
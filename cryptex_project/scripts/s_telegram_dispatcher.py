@@ -0,0 +1,233 @@
+# Coalescing, rate-limited delivery of Cryptex alerts to Telegram.
+# Signals are queued durably in alert_queue. Signals for the same chat and asset that
+# arrive within the coalesce window share one queued message.
+# Each message is claimed (status SENDING) and committed before it is sent and marked
+# SENT right after, so a crash can repeat at most the one message in flight; claims
+# older than CLAIM_LEASE_SECONDS are returned to the queue.
+# Telegram's global and per-chat limits are enforced through send slots reserved in
+# Postgres, so every process that sends alerts shares them. A 429 reschedules the
+# message after Telegram's retry_after without using up an attempt; other errors are
+# retried with backoff until the attempt limit, after which the message is DROPPED.
+import os, time, random, statistics
+from typing import List, Dict, Any, Optional
+import requests
+from psycopg2.extras import Json
+import s_http_client as http_client
+from s_db import get_cursor
+from s_telegram_alerter import format_signal, format_context
+from s_metrics import timer, observe_lag, flush as flush_metrics
+
+# Telegram allows roughly 30 messages/s per bot and 1 message/s per chat
+GLOBAL_MESSAGES_PER_SECOND = 30.0
+CHAT_MESSAGES_PER_SECOND = 1.0
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+CLAIM_LEASE_SECONDS = 300
+
+RESERVE_SLOT_QUERY = """
+INSERT INTO public.telegram_send_slots (bucket, next_slot_at)
+VALUES (%(bucket)s, GREATEST(NOW(), %(not_before)s) + make_interval(secs => %(spacing)s))
+ON CONFLICT (bucket) DO UPDATE SET
+    next_slot_at = GREATEST(telegram_send_slots.next_slot_at, NOW(), %(not_before)s) + make_interval(secs => %(spacing)s)
+RETURNING next_slot_at - make_interval(secs => %(spacing)s)
+"""
+
+def format_coalesced(signals: List[Dict[str, Any]]) -> str:
+    """One signal renders as usual; several for the same asset become one summary message."""
+    if len(signals) == 1: return format_signal(signals[0])
+    lines = [f"🚨 **Cryptex: {len(signals)} signals on {signals[0].get('asset')}** 🚨", ""]
+    for s in signals:
+        size = s.get("trade_size_usd")
+        size_text = f"${float(size):,.0f}" if size is not None else "n/a"
+        lines.append(f"• `{s.get('direction') or 'n/a'}` {size_text} by `{s.get('trader_wallet')}` "
+                     f"({s.get('ai_confidence_score') if s.get('ai_confidence_score') is not None else 'n/a'}%)")
+        lines.append(f"  {s.get('catalyst_headline') or ''}")
+    # Signals are coalesced per asset, so the latest one carries the freshest flow
+    context = format_context(signals[-1])
+    if context: lines.extend(["", context.strip()])
+    return "\n".join(lines)
+
+def enqueue(cur, chat_id: str, signals: List[Dict[str, Any]], coalesce_window_seconds: float) -> Dict[str, int]:
+    """Queues signals, folding each into a not-yet-due message for the same chat and asset if there is one."""
+    queued = coalesced = 0
+    for signal in signals:
+        key = signal.get("asset") or signal.get("signal_id")
+        cur.execute(
+            """
+            UPDATE public.alert_queue SET signals = signals || %s::jsonb
+            WHERE id = (
+                SELECT id FROM public.alert_queue
+                WHERE chat_id = %s AND coalesce_key = %s AND status = 'PENDING'
+                AND attempts = 0 AND next_attempt_at > NOW()
+                ORDER BY id LIMIT 1 FOR UPDATE
+            )
+            RETURNING id
+            """,
+            (Json([signal]), chat_id, key)
+        )
+        if cur.fetchone():
+            coalesced += 1
+            continue
+        cur.execute(
+            """
+            INSERT INTO public.alert_queue (chat_id, coalesce_key, signals, next_attempt_at)
+            VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+            """,
+            (chat_id, key, Json([signal]), coalesce_window_seconds)
+        )
+        queued += 1
+    return {"queued": queued, "coalesced": coalesced}
+
+def _retry_after(res: requests.Response) -> Optional[float]:
+    try:
+        return float(res.json().get("parameters", {}).get("retry_after"))
+    except (ValueError, TypeError, AttributeError):
+        pass
+    return http_client.retry_after_seconds(res)
+
+def reserve_send_slot(chat_id: str) -> float:
+    """Reserves the next send slot free in both the chat's and the bot's bucket; returns seconds until it."""
+    with get_cursor() as cur:
+        cur.execute("SELECT NOW()")
+        now = cur.fetchone()[0]
+        cur.execute(RESERVE_SLOT_QUERY, {"bucket": f"chat:{chat_id}", "not_before": now, "spacing": 1.0 / CHAT_MESSAGES_PER_SECOND})
+        chat_slot = cur.fetchone()[0]
+        cur.execute(RESERVE_SLOT_QUERY, {"bucket": "global", "not_before": chat_slot, "spacing": 1.0 / GLOBAL_MESSAGES_PER_SECOND})
+        slot = cur.fetchone()[0]
+    return max(0.0, (slot - now).total_seconds())
+
+def pause_chat(chat_id: str, seconds: float):
+    """Pushes the chat's next slot past Telegram's retry_after for every sender."""
+    with get_cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO public.telegram_send_slots (bucket, next_slot_at) VALUES (%s, NOW() + make_interval(secs => %s))
+            ON CONFLICT (bucket) DO UPDATE SET next_slot_at = GREATEST(telegram_send_slots.next_slot_at, EXCLUDED.next_slot_at)
+            """,
+            (f"chat:{chat_id}", seconds)
+        )
+
+def send_message(bot_token: str, chat_id: str, text: str) -> Optional[float]:
+    """Sends one message under the rate limits. Returns None on success, else Telegram's retry_after in seconds."""
+    time.sleep(reserve_send_slot(chat_id))
+    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    with timer("telegram_send"):
+        # retries=0: a 429 is rescheduled through the queue rather than slept on here
+        res = http_client.post(url, json={"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}, timeout=10, retries=0)
+    if res.status_code == 429:
+        return _retry_after(res) or BACKOFF_BASE_SECONDS
+    res.raise_for_status()
+    return None
+
+def claim_next(cur) -> Optional[tuple]:
+    """Marks the next due message SENDING and returns it; the caller commits before sending."""
+    # SKIP LOCKED lets concurrent dispatchers share the queue without double-sending
+    cur.execute(
+        """
+        UPDATE public.alert_queue SET status = 'SENDING', claimed_at = NOW()
+        WHERE id = (
+            SELECT id FROM public.alert_queue
+            WHERE status = 'PENDING' AND next_attempt_at <= NOW()
+            ORDER BY next_attempt_at LIMIT 1 FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, chat_id, signals, attempts
+        """
+    )
+    return cur.fetchone()
+
+def release_stale_claims(cur) -> int:
+    """Requeues messages whose sender died mid-send; Telegram may or may not have delivered them."""
+    cur.execute(
+        "UPDATE public.alert_queue SET status = 'PENDING' WHERE status = 'SENDING' "
+        "AND claimed_at < NOW() - make_interval(secs => %s)",
+        (CLAIM_LEASE_SECONDS,)
+    )
+    return cur.rowcount
+
+def flush(bot_token: str, batch_size: int = 50) -> Dict[str, Any]:
+    """Sends up to `batch_size` due queued messages once; failed ones are rescheduled or dropped."""
+    stats = {"sent": 0, "retried": 0, "rate_limited": 0, "dropped": 0, "latencies_ms": []}
+    with get_cursor() as cur:
+        released = release_stale_claims(cur)
+    if released:
+        print(f"INFO: [Cryptex-Dispatcher] Requeued {released} alert(s) left SENDING by an earlier run.")
+    for _ in range(batch_size):
+        with get_cursor() as cur:
+            claimed = claim_next(cur)
+        if claimed is None: break
+        alert_id, chat_id, signals, attempts = claimed
+        started = time.monotonic()
+        retry_after, error = None, None
+        try:
+            retry_after = send_message(bot_token, chat_id, format_coalesced(signals))
+        except Exception as e:
+            error = str(e)
+        with get_cursor() as cur:
+            if retry_after is None and error is None:
+                stats["latencies_ms"].append((time.monotonic() - started) * 1000)
+                stats["sent"] += 1
+                cur.execute("UPDATE public.alert_queue SET status = 'SENT', sent_at = NOW(), attempts = attempts + 1 WHERE id = %s", (alert_id,))
+                for s in signals:
+                    observe_lag("signal_to_alert", s.get("created_ts"))
+                    observe_lag("source_to_alert", s.get("source_ts"))
+            elif retry_after is not None:
+                # Rate limiting is not a failure of the message: requeue without spending an attempt
+                stats["rate_limited"] += 1
+                pause_chat(chat_id, retry_after)
+                cur.execute(
+                    """
+                    UPDATE public.alert_queue SET status = 'PENDING', last_error = 'rate limited',
+                        next_attempt_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s
+                    """,
+                    (retry_after, alert_id)
+                )
+            elif attempts + 1 >= MAX_ATTEMPTS:
+                stats["dropped"] += 1
+                print(f"ERROR: [Cryptex-Dispatcher] Dropping alert {alert_id} after {attempts + 1} attempts. Error: {error}")
+                cur.execute("UPDATE public.alert_queue SET status = 'DROPPED', attempts = attempts + 1, last_error = %s WHERE id = %s", (error, alert_id))
+            else:
+                stats["retried"] += 1
+                cur.execute(
+                    """
+                    UPDATE public.alert_queue SET status = 'PENDING', attempts = attempts + 1, last_error = %s,
+                        next_attempt_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s
+                    """,
+                    (error, BACKOFF_BASE_SECONDS * (2 ** attempts) * (1 + random.random()), alert_id)
+                )
+    return stats
+
+def main(signals: Optional[List[Dict[str, Any]]] = None, coalesce_window_seconds: float = 10.0) -> Dict[str, Any]:
+    """
+    Queues new signals, waits out the coalesce window and delivers everything due.
+
+    Args:
+        signals: Signals from the correlation engine; may be empty to just drain the retry queue.
+        coalesce_window_seconds: How long a message waits for more signals on the same asset.
+
+    Returns:
+        Counts of queued, coalesced, sent, retried, rate-limited and dropped messages plus send latency.
+    """
+    bot_token = os.environ.get("WMILL_SECRET_TELEGRAM_CRYPTEX_BOT_TOKEN")
+    chat_id = os.environ.get("WMILL_SECRET_TELEGRAM_CRYPTEX_CHAT_ID")
+    if not all([bot_token, chat_id]):
+        raise ValueError("Cryptex Telegram secrets are missing. Please set them in the Windmill UI.")
+    # The correlation engine returns a status dict instead of a list when it had nothing to check
+    signals = signals if isinstance(signals, list) else []
+
+    with get_cursor() as cur:
+        counts = enqueue(cur, chat_id, signals, coalesce_window_seconds)
+    if counts["queued"]:
+        time.sleep(coalesce_window_seconds)
+    stats = flush(bot_token)
+
+    flush_metrics("telegram_dispatcher")
+    latencies = stats.pop("latencies_ms")
+    report = {
+        **counts, **stats,
+        "send_latency_p50_ms": round(statistics.median(latencies), 1) if latencies else None,
+        "send_latency_max_ms": round(max(latencies), 1) if latencies else None,
+    }
+    print(f"INFO: [Cryptex-Dispatcher] {report}")
+    return report
@@ -0,0 +1,6 @@
+import os, sys
+
+# Scripts import each other (and shared/) as top-level modules, as they do under Windmill
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for path in (os.path.join(ROOT, "cryptex_project", "scripts"), os.path.join(ROOT, "shared")):
+    if path not in sys.path: sys.path.insert(0, path)
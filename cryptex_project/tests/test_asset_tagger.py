@@ -0,0 +1,27 @@
+import pytest
+from s_asset_tagger import get_tagger
+
+@pytest.fixture(scope="module")
+def tagger():
+    return get_tagger()
+
+@pytest.mark.parametrize("text, expected", [
+    ("$BTC reclaims the 200-day average", {"BTC": 1.0}),
+    ("ETH and SOL lead the rebound", {"ETH": 0.8, "SOL": 0.8}),
+    ("Ripple Labs settles with the SEC", {"XRP": 0.6}),
+    ("Polygon Labs cuts a fifth of its staff", {"MATIC": 0.6}),
+    ("Avalanche network upgrade goes live", {"AVAX": 0.6}),
+])
+def test_tags_mentions(tagger, text, expected):
+    assert tagger.tag(text) == expected
+
+@pytest.mark.parametrize("text", [
+    "Rate cut sends a ripple effect through risk assets",
+    "An avalanche of liquidations hit leveraged longs overnight",
+    "Avalanche Of Liquidations Wipes Out $1B In Longs",
+    "Traders model the order book as a polygon of resting bids",
+    "Cautious optimism returns to crypto markets",
+    "Traders sold their link to the old exchange",
+])
+def test_ignores_ordinary_words(tagger, text):
+    assert tagger.tag(text) == {}
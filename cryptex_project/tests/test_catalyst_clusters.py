@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+from s_catalyst_clusters import SIMILARITY_THRESHOLD, band_keys, minhash, normalize, similarity
+
+# Headline + description of one story as two outlets published it
+SYNDICATED = [
+ ("Bitcoin Tops $100K for the First Time as ETF Inflows Surge\nThe world's largest cryptocurrency crossed the six-figure mark on Thursday, driven by record spot ETF inflows.",
+  "BTC breaks above $100,000 for first time, fueled by record ETF inflows\nBitcoin climbed past $100,000 on Thursday as spot bitcoin ETFs drew record inflows."),
+ ("SEC Approves Spot Ether ETFs in Landmark Decision\nThe U.S. Securities and Exchange Commission approved applications for spot ether exchange-traded funds on Thursday.",
+  "US SEC approves spot Ethereum ETFs, a landmark for crypto\nThe Securities and Exchange Commission on Thursday approved spot ether ETF applications from several issuers."),
+ ("Solana Network Suffers Five-Hour Outage, Block Production Halted\nValidators coordinated a restart after the Solana blockchain stopped producing blocks for roughly five hours.",
+  "Solana blockchain halts for 5 hours as block production stops\nSolana validators restarted the network after a roughly five-hour outage halted block production."),
+ ("Hackers Drain $320 Million From Wormhole Bridge\nAttackers exploited a vulnerability in the Wormhole token bridge, stealing about 120,000 wrapped ether worth $320 million.",
+  "Wormhole bridge exploited for $320M in wrapped ETH\nA hacker stole roughly 120K wETH, worth about $320 million, from the Wormhole cross-chain bridge by exploiting a bug."),
+ ("Binance to Pay $4.3 Billion, CZ Steps Down as CEO\nBinance agreed to pay $4.3 billion to settle U.S. charges and Changpeng Zhao pleaded guilty and resigned.",
+  "Binance's Changpeng Zhao pleads guilty, steps down as exchange agrees to $4.3B settlement\nCZ resigned as CEO of Binance, which will pay $4.3 billion to resolve a U.S. investigation."),
+ ("Dogecoin Jumps 20% After Musk Tweet\nDOGE rallied about 20% on Monday after Elon Musk posted about the meme coin on X.",
+  "DOGE surges 20 percent following Elon Musk post\nThe meme coin dogecoin jumped roughly 20% Monday after Elon Musk posted about it on X."),
+ ("Ethereum Completes Dencun Upgrade, Cutting Layer-2 Fees\nThe Dencun hard fork went live on Ethereum mainnet on Wednesday, introducing proto-danksharding to reduce rollup fees.",
+  "Ethereum's Dencun upgrade goes live, slashing L2 fees\nEthereum activated the Dencun hard fork on mainnet Wednesday, bringing proto-danksharding and lower fees for layer-2 rollups."),
+ ("MicroStrategy Buys Another 12,000 Bitcoin for $821 Million\nMicroStrategy acquired about 12,000 BTC for roughly $821 million, bringing its holdings to 205,000 bitcoin.",
+  "MicroStrategy adds 12K BTC worth $821M to its treasury\nMicroStrategy said it bought roughly 12,000 bitcoin for $821 million, lifting total holdings to about 205K BTC."),
+ ("XRP Soars After Court Rules Ripple Sales Were Not Securities\nA federal judge ruled that Ripple's programmatic sales of XRP on exchanges did not constitute securities offerings.",
+  "Ripple wins partial victory against SEC, XRP price jumps\nXRP surged after a U.S. judge ruled that Ripple Labs' sales of XRP on public exchanges were not securities."),
+ ("Circle's USDC Loses Dollar Peg After SVB Exposure Revealed\nUSDC fell as low as 87 cents after Circle disclosed $3.3 billion of its reserves were held at Silicon Valley Bank.",
+  "USDC stablecoin depegs to $0.87 on Silicon Valley Bank exposure\nCircle said $3.3B of USDC reserves sat at SVB, sending the stablecoin as low as 87 cents."),
+]
+# Different stories about the same asset or event type
+SAME_TOPIC = [
+ ("Bitcoin Tops $100K for the First Time as ETF Inflows Surge\nThe world's largest cryptocurrency crossed the six-figure mark on Thursday, driven by record spot ETF inflows.",
+  "Bitcoin ETFs see record outflows as price slides below $90,000\nSpot bitcoin ETFs recorded their largest daily outflows on Tuesday as BTC fell under $90,000."),
+ ("Solana Network Suffers Five-Hour Outage, Block Production Halted\nValidators coordinated a restart after the Solana blockchain stopped producing blocks for roughly five hours.",
+  "Solana network activity hits record as memecoin trading booms\nDaily transactions on the Solana blockchain reached an all-time high as memecoin trading surged."),
+ ("Hackers Drain $320 Million From Wormhole Bridge\nAttackers exploited a vulnerability in the Wormhole token bridge, stealing about 120,000 wrapped ether worth $320 million.",
+  "Ronin bridge hacked for $625 million in ETH and USDC\nAttackers drained 173,600 ether and 25.5 million USDC from the Ronin bridge used by Axie Infinity."),
+ ("Dogecoin Jumps 20% After Musk Tweet\nDOGE rallied about 20% on Monday after Elon Musk posted about the meme coin on X.",
+  "Dogecoin falls 15% as meme coin rally fades\nDOGE dropped roughly 15% on Friday as traders took profits from the week's meme coin rally."),
+ ("MicroStrategy Buys Another 12,000 Bitcoin for $821 Million\nMicroStrategy acquired about 12,000 BTC for roughly $821 million, bringing its holdings to 205,000 bitcoin.",
+  "Tesla sells 75% of its bitcoin holdings for $936 million\nTesla said it converted about 75% of its bitcoin purchases into fiat currency, raising $936 million."),
+ ("Binance to Pay $4.3 Billion, CZ Steps Down as CEO\nBinance agreed to pay $4.3 billion to settle U.S. charges and Changpeng Zhao pleaded guilty and resigned.",
+  "Binance halts withdrawals temporarily after surge in requests\nBinance paused withdrawals for several hours on Monday after a spike in customer withdrawal requests."),
+ ("Ethereum Completes Dencun Upgrade, Cutting Layer-2 Fees\nThe Dencun hard fork went live on Ethereum mainnet on Wednesday, introducing proto-danksharding to reduce rollup fees.",
+  "Ethereum developers set date for Pectra upgrade on mainnet\nEthereum core developers agreed on a mainnet date for the Pectra hard fork, which will raise validator staking limits."),
+]
+
+@pytest.mark.parametrize("a, b", SYNDICATED)
+def test_syndicated_rewrites_cluster(a, b):
+    sig_a, sig_b = minhash(a), minhash(b)
+    assert similarity(sig_a, sig_b) >= SIMILARITY_THRESHOLD
+    # LSH must surface the pair as a candidate in the first place
+    assert set(band_keys(sig_a)) & set(band_keys(sig_b))
+
+@pytest.mark.parametrize("a, b", SAME_TOPIC)
+def test_different_stories_stay_apart(a, b):
+    assert similarity(minhash(a), minhash(b)) < SIMILARITY_THRESHOLD
+
+@pytest.mark.parametrize("a, b", [
+    ("Bitcoin tops $100K", "BTC tops $100,000"),
+    ("Binance to pay $4.3 billion", "Binance to pay $4.3B"),
+    ("DOGE jumps 20%", "Dogecoin jumps 20 percent"),
+    ("Network down for five hours", "Network down for 5 hours"),
+])
+def test_normalize_amounts_and_names(a, b):
+    assert normalize(a) == normalize(b)
@@ -0,0 +1,158 @@
+# Shared outbound HTTP client for the cryptex and content scripts.
+# - One pooled keep-alive session per host, reused for the life of the worker process,
+#   so repeated calls skip the TCP and TLS handshakes.
+# - Every request has a timeout; None is not accepted.
+# - 429s, 5xx responses and connection errors are retried with jittered exponential
+#   backoff, honouring Retry-After. Non-idempotent methods are only retried on 429
+#   (the request was refused, not processed) unless the caller marks them idempotent.
+# - Optional ETag/Last-Modified cache for GETs, kept on disk so it survives between
+#   job runs: a 304 is answered from the stored body.
+import os, json, time, random, hashlib, threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+Timeout = Union[float, Tuple[float, float]]
+
+DEFAULT_TIMEOUT: Timeout = (5.0, 30.0)  # (connect, read) seconds
+# LLM and media generation endpoints legitimately take minutes to answer
+LONG_TIMEOUT: Timeout = (5.0, 180.0)
+DEFAULT_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+# A server asking for a longer pause than this gets its response handed back instead
+MAX_RETRY_AFTER_SECONDS = 120.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "16"))
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join("/tmp", "http_cache"))
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+def get_session(url: str) -> requests.Session:
+    """The pooled session for `url`'s scheme and host, created on first use."""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled below, where Retry-After and jitter are under our control
+            session.mount(key, HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0))
+            _sessions[key] = session
+    return session
+
+def retry_after_seconds(res: requests.Response) -> Optional[float]:
+    """Parses Retry-After as delta-seconds or an HTTP date; None when absent or unparseable."""
+    value = res.headers.get("Retry-After")
+    if not value: return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_seconds(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = MAX_BACKOFF_SECONDS) -> float:
+    """Full-jitter exponential backoff for the given 0-based attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def _cache_path(url: str, params: Any) -> str:
+    key = json.dumps([url, sorted((params or {}).items()) if isinstance(params, dict) else params], default=str)
+    return os.path.join(CACHE_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+def _load_cached(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _store_cached(path: str, res: requests.Response):
+    validators = {k: res.headers[k] for k in ("ETag", "Last-Modified") if k in res.headers}
+    if not validators: return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"validators": validators, "headers": dict(res.headers), "encoding": res.encoding,
+                       "body": res.content.decode("latin-1")}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"ERROR: [HTTP Client] Could not write cache entry. Error: {e}")
+
+def _from_cache(entry: Dict[str, Any], res: requests.Response) -> requests.Response:
+    """Turns a 304 into the cached 200, keeping the fresh response's URL and request."""
+    cached = requests.Response()
+    cached.status_code = 200
+    cached.headers.update(entry["headers"])
+    cached.headers.update(res.headers)
+    cached._content = entry["body"].encode("latin-1")
+    cached.encoding = entry.get("encoding")
+    cached.url, cached.request, cached.elapsed = res.url, res.request, res.elapsed
+    cached.from_cache = True
+    return cached
+
+def request(method: str, url: str, *, timeout: Timeout = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+            idempotent: Optional[bool] = None, cache: bool = False, **kwargs) -> requests.Response:
+    """
+    Sends a request over the host's pooled session with retries.
+
+    Args:
+        method: HTTP method.
+        url: Absolute URL.
+        timeout: Seconds, or (connect, read) seconds. Required; None is rejected.
+        retries: Extra attempts after the first one.
+        idempotent: Whether 5xx and connection errors may be retried; defaults by method.
+        cache: GET only. Revalidate a stored copy with If-None-Match/If-Modified-Since.
+        **kwargs: Passed to requests (params, json, data, headers, files, stream, ...).
+
+    Returns:
+        The final response, whatever its status; callers still call raise_for_status().
+        A response served from the cache has `from_cache = True`.
+    """
+    if timeout is None: raise ValueError("A timeout is required for outbound HTTP requests.")
+    method = method.upper()
+    if idempotent is None: idempotent = method in IDEMPOTENT_METHODS
+    entry, path = None, None
+    if cache and method == "GET":
+        path = _cache_path(url, kwargs.get("params"))
+        entry = _load_cached(path)
+        if entry:
+            headers = dict(kwargs.pop("headers", None) or {})
+            if "ETag" in entry["validators"]: headers["If-None-Match"] = entry["validators"]["ETag"]
+            if "Last-Modified" in entry["validators"]: headers["If-Modified-Since"] = entry["validators"]["Last-Modified"]
+            kwargs["headers"] = headers
+    session = get_session(url)
+    attempt = 0
+    while True:
+        try:
+            res = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not idempotent or attempt >= retries: raise
+            wait = backoff_seconds(attempt)
+            print(f"INFO: [HTTP Client] {method} {urlsplit(url).netloc} failed ({e.__class__.__name__}), retrying in {wait:.1f}s.")
+        else:
+            retryable = res.status_code == 429 or (idempotent and res.status_code in RETRY_STATUSES)
+            if not retryable or attempt >= retries:
+                if entry is not None and res.status_code == 304: return _from_cache(entry, res)
+                if path is not None and res.status_code == 200: _store_cached(path, res)
+                return res
+            wait = retry_after_seconds(res)
+            if wait is not None and wait > MAX_RETRY_AFTER_SECONDS: return res
+            if wait is None: wait = backoff_seconds(attempt)
+            print(f"INFO: [HTTP Client] {method} {urlsplit(url).netloc} returned {res.status_code}, retrying in {wait:.1f}s.")
+            res.close()
+        time.sleep(wait)
+        attempt += 1
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,150 @@
+# Content-addressed cache for LLM completions, shared by every content engine.
+# A completion is keyed by a hash of (provider, model, system prompt, user prompt,
+# generation params), so a retried flow step or a repeated request with the same
+# inputs is answered from disk instead of the provider.
+#
+# Entries live in one SQLite file (LLM_CACHE_PATH) with a TTL and LRU eviction once
+# the cache holds more than LLM_CACHE_MAX_ENTRIES. Hit/miss/eviction counters are
+# kept in the same file so they add up across job runs; see stats().
+# Only successful results are stored: if `compute` raises, nothing is cached.
+# A caller that wants a fresh answer for the same inputs (a human rejected the draft
+# and asked for another) passes refresh=True: the provider is called and its result
+# replaces the cached one.
+import os, json, time, sqlite3, hashlib, threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join("/tmp", "llm_cache.sqlite3"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+DISABLED = os.environ.get("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    provider TEXT,
+    model TEXT,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+@contextmanager
+def _connect(path: str = CACHE_PATH):
+    # One short-lived connection per call keeps the cache safe to use from worker threads
+    if path not in _schema_ready: os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if path not in _schema_ready:
+            with _schema_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                _schema_ready.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _bump(conn, name: str, by: int = 1):
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, by)
+    )
+
+def cache_key(provider: str, model: str, system_prompt: Optional[str], user_prompt: str,
+              params: Optional[Dict[str, Any]] = None) -> str:
+    payload = {"provider": provider, "model": model, "system": system_prompt or "", "user": user_prompt, "params": params or {}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def get(key: str) -> Optional[Any]:
+    """The cached value for `key`, or None on a miss or an expired entry."""
+    now = time.time()
+    with _connect() as conn:
+        row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            if row is not None:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                _bump(conn, "expired")
+            _bump(conn, "misses")
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        _bump(conn, "hits")
+    return json.loads(row[0])
+
+def put(key: str, value: Any, provider: str = "", model: str = "", ttl_seconds: Optional[float] = None):
+    now = time.time()
+    ttl = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, provider, model, value, created_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, json.dumps(value), now, now + ttl, now)
+        )
+        evict(conn, now)
+
+def evict(conn, now: Optional[float] = None) -> int:
+    """Drops expired entries, then the least recently used ones beyond MAX_ENTRIES."""
+    now = time.time() if now is None else now
+    expired = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+    overflow = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - MAX_ENTRIES
+    evicted = 0
+    if overflow > 0:
+        evicted = conn.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_access LIMIT ?)", (overflow,)
+        ).rowcount
+    if expired: _bump(conn, "expired", expired)
+    if evicted: _bump(conn, "evictions", evicted)
+    return expired + evicted
+
+def cached_completion(provider: str, model: str, system_prompt: Optional[str], user_prompt: str,
+                      params: Optional[Dict[str, Any]], compute: Callable[[], Any],
+                      ttl_seconds: Optional[float] = None, refresh: bool = False) -> Any:
+    """
+    Returns the cached result for these inputs, or calls `compute()` and caches what it returns.
+
+    Args:
+        provider: e.g. "openai", "anthropic", "gemini".
+        model: Model name as sent to the provider.
+        system_prompt: System instructions, if the call has any.
+        user_prompt: The user message.
+        params: Every other generation setting that changes the output (max_tokens, response format, ...).
+        compute: Makes the real call; its result must be JSON-serializable.
+        ttl_seconds: Overrides LLM_CACHE_TTL_SECONDS for this entry.
+        refresh: Skip the lookup and overwrite the entry with a new result.
+    """
+    if DISABLED: return compute()
+    key = cache_key(provider, model, system_prompt, user_prompt, params)
+    try:
+        cached = None if refresh else get(key)
+    except (sqlite3.Error, OSError) as e:
+        # A broken cache must never block generation
+        print(f"ERROR: [LLM Cache] Lookup failed, calling {provider}. Error: {e}")
+        return compute()
+    if cached is not None:
+        print(f"INFO: [LLM Cache] Hit for {provider}/{model} ({key[:12]}).")
+        return cached
+    value = compute()
+    try:
+        put(key, value, provider, model, ttl_seconds)
+    except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+        print(f"ERROR: [LLM Cache] Could not store result for {provider}/{model}. Error: {e}")
+    return value
+
+def stats() -> Dict[str, Any]:
+    """Lifetime hit/miss/eviction counters plus the current entry count and hit rate."""
+    with _connect() as conn:
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "hits": hits, "misses": misses,
+        "evictions": counters.get("evictions", 0), "expired": counters.get("expired", 0),
+        "entries": entries,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+    }
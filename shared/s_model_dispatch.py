@@ -0,0 +1,281 @@
+# Latency-aware model dispatch for the content engines, driven by the
+# engines.<name>.primary_model / fallback_models chains in model_routing.yaml.
+#
+# The first model in the chain is called right away. If it has not answered within
+# the engine's hedge_after_seconds, the next model is fired as a hedge, and so on
+# down the chain; a model that fails hands over to the next one immediately. The
+# first valid answer wins. Each call runs on a daemon thread, so a losing call that is
+# still in flight does not keep the job alive once the answer is returned; provider
+# clients are built with SDK retries off so a stalled call ends at its own timeout.
+#
+# Every call's latency and outcome is recorded per model in a small SQLite file so
+# that, across job runs, a model that keeps stalling or failing is moved down the
+# chain (dispatch.reorder_chain).
+import os, json, time, sqlite3, threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Callable
+import yaml
+import s_http_client as http_client
+
+CONFIG_PATH = os.environ.get(
+    "MODEL_ROUTING_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "content_project", "config", "model_routing.yaml")
+)
+STATS_PATH = os.environ.get("MODEL_DISPATCH_STATS_PATH", os.path.join("/tmp", "model_dispatch.sqlite3"))
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+DEFAULT_HEDGE_AFTER_SECONDS = 10.0
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 60.0
+
+API_KEY_ENV = {
+    "openai": ["WMILL_SECRET_OPENAI_API_KEY", "OPENAI_API_KEY"],
+    "anthropic": ["WMILL_SECRET_ANTHROPIC_API_KEY", "ANTHROPIC_API_KEY"],
+    "gemini": ["WMILL_SECRET_GEMINI_API_KEY", "GEMINI_API_KEY"],
+}
+
+@lru_cache(maxsize=None)
+def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+def parse_json_object(text: str) -> Dict[str, Any]:
+    """json.loads for models without a JSON mode, which may wrap the object in prose or a code fence."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start: raise ValueError("No JSON object in model output.")
+    return json.loads(text[start:end + 1])
+
+def provider_for(model: str) -> str:
+    if model.startswith("claude"): return "anthropic"
+    if model.startswith("gemini"): return "gemini"
+    return "openai"
+
+def _api_key(provider: str, api_keys: Optional[Dict[str, str]]) -> str:
+    key = (api_keys or {}).get(provider) or next((os.environ[v] for v in API_KEY_ENV[provider] if os.environ.get(v)), None)
+    if not key: raise ValueError(f"No API key for provider '{provider}'.")
+    return key
+
+# --- Provider calls: each returns the completion text ---
+
+# Retries are the dispatcher's job (the next model in the chain), not the SDK's
+@lru_cache(maxsize=None)
+def _openai_client(api_key: str, timeout: float):
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, timeout=timeout, max_retries=0)
+
+@lru_cache(maxsize=None)
+def _anthropic_client(api_key: str, timeout: float):
+    from anthropic import Anthropic
+    return Anthropic(api_key=api_key, timeout=timeout, max_retries=0)
+
+def _call_openai(model, api_key, system_prompt, user_prompt, max_tokens, json_mode, timeout) -> str:
+    extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+    response = _openai_client(api_key, timeout).chat.completions.create(
+        model=model, max_tokens=max_tokens, timeout=timeout,
+        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}], **extra
+    )
+    return response.choices[0].message.content
+
+def _call_anthropic(model, api_key, system_prompt, user_prompt, max_tokens, json_mode, timeout) -> str:
+    message = _anthropic_client(api_key, timeout).messages.create(
+        model=model, max_tokens=max_tokens, system=system_prompt, timeout=timeout,
+        messages=[{"role": "user", "content": user_prompt}]
+    )
+    return message.content[0].text
+
+def _call_gemini(model, api_key, system_prompt, user_prompt, max_tokens, json_mode, timeout) -> str:
+    generation_config: Dict[str, Any] = {"maxOutputTokens": max_tokens}
+    if json_mode: generation_config["response_mime_type"] = "application/json"
+    payload = {
+        "system_instruction": {"parts": [{"text": system_prompt}]},
+        "contents": [{"parts": [{"text": user_prompt}]}],
+        "generationConfig": generation_config,
+    }
+    response = http_client.post(GEMINI_API_URL.format(model=model), params={"key": api_key}, json=payload,
+                                timeout=(5.0, timeout), retries=0)
+    response.raise_for_status()
+    return response.json()['candidates'][0]['content']['parts'][0]['text']
+
+PROVIDER_CALLS: Dict[str, Callable[..., str]] = {
+    "openai": _call_openai, "anthropic": _call_anthropic, "gemini": _call_gemini,
+}
+
+# --- Per-model latency and error history ---
+
+_stats_ready = set()
+_stats_lock = threading.Lock()
+
+@contextmanager
+def _stats_db(path: str = STATS_PATH):
+    if path not in _stats_ready: os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if path not in _stats_ready:
+            with _stats_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS model_calls (model TEXT NOT NULL, called_at REAL NOT NULL, "
+                    "latency_seconds REAL NOT NULL, ok INTEGER NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_model_calls_model ON model_calls(model, called_at)")
+                _stats_ready.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def record(model: str, latency_seconds: float, ok: bool, keep: int = 500):
+    try:
+        with _stats_db() as conn:
+            conn.execute("INSERT INTO model_calls VALUES (?, ?, ?, ?)", (model, time.time(), latency_seconds, int(ok)))
+            conn.execute(
+                "DELETE FROM model_calls WHERE model = ? AND called_at < "
+                "(SELECT called_at FROM model_calls WHERE model = ? ORDER BY called_at DESC LIMIT 1 OFFSET ?)",
+                (model, model, keep)
+            )
+    except (sqlite3.Error, OSError) as e:
+        print(f"ERROR: [Model Dispatch] Could not record stats for {model}. Error: {e}")
+
+def model_stats(models: List[str], window: int = 50, max_age_hours: float = 6.0) -> Dict[str, Dict[str, Any]]:
+    """Rolling call count, error rate and p50/p90 success latency over each model's last `window` calls within `max_age_hours`."""
+    result = {}
+    try:
+        with _stats_db() as conn:
+            for model in models:
+                rows = conn.execute(
+                    "SELECT latency_seconds, ok FROM model_calls WHERE model = ? AND called_at >= ? "
+                    "ORDER BY called_at DESC LIMIT ?",
+                    (model, time.time() - max_age_hours * 3600, window)
+                ).fetchall()
+                latencies = sorted(latency for latency, ok in rows if ok)
+                pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+                result[model] = {
+                    "calls": len(rows),
+                    "error_rate": round(sum(1 for _, ok in rows if not ok) / len(rows), 3) if rows else None,
+                    "p50_seconds": pick(0.5), "p90_seconds": pick(0.9),
+                }
+    except (sqlite3.Error, OSError) as e:
+        print(f"ERROR: [Model Dispatch] Could not read model stats. Error: {e}")
+    return result
+
+def order_chain(chain: List[str], stats: Dict[str, Dict[str, Any]], min_samples: int = 5,
+                error_penalty: float = 4.0) -> List[str]:
+    """
+    Sorts the models with at least `min_samples` recent calls by expected cost, p90
+    latency inflated by the error rate, across the positions they hold in the chain.
+    Models without enough history keep their configured position, which is also how a
+    demoted model gets its turn again once its bad history ages out.
+    """
+    def cost(model: str) -> Optional[float]:
+        s = stats.get(model) or {}
+        if (s.get("calls") or 0) < min_samples: return None
+        if s.get("p90_seconds") is None: return float("inf")
+        return s["p90_seconds"] * (1.0 + error_penalty * (s.get("error_rate") or 0.0))
+    costs = {m: cost(m) for m in chain}
+    scored = iter(sorted((m for m in chain if costs[m] is not None), key=lambda m: costs[m]))
+    return [m if costs[m] is None else next(scored) for m in chain]
+
+# --- Dispatch ---
+
+def _run_detached(func: Callable[..., Any], *args) -> Future:
+    """Runs func on a daemon thread; unlike an executor worker it is not joined at interpreter exit."""
+    future: Future = Future()
+    future.set_running_or_notify_cancel()
+
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def engine_chain(engine: str, config: Optional[Dict[str, Any]] = None, primary_model: Optional[str] = None) -> List[str]:
+    engine_config = ((config or load_config()).get("engines") or {}).get(engine) or {}
+    primary = primary_model or engine_config.get("primary_model") or engine_config.get("model")
+    chain = [primary] + list(engine_config.get("fallback_models") or [])
+    return list(dict.fromkeys(m for m in chain if m))
+
+def dispatch(engine: str, system_prompt: str, user_prompt: str, *, primary_model: Optional[str] = None,
+             max_tokens: int = 1024, json_mode: bool = False, parse: Optional[Callable[[str], Any]] = None,
+             api_keys: Optional[Dict[str, str]] = None, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Runs one completion for `engine` across its model chain with hedging.
+
+    Args:
+        engine: Key under `engines` in model_routing.yaml.
+        system_prompt: System instructions.
+        user_prompt: The user message.
+        primary_model: Overrides the configured primary; the fallbacks still follow it.
+        max_tokens: Output limit passed to every provider.
+        json_mode: Ask providers that support it for a JSON object.
+        parse: Applied to the text; if it raises, that model's answer counts as a failure.
+        api_keys: provider -> key; missing providers fall back to the WMILL_SECRET_* env vars.
+        config: Parsed model_routing.yaml; loaded from MODEL_ROUTING_PATH when omitted.
+
+    Returns:
+        {"model", "output", "latency_seconds", "attempted"} where output is the parsed answer.
+
+    Raises:
+        RuntimeError: When every model in the chain failed or the overall deadline passed.
+    """
+    config = config or load_config()
+    engine_config = (config.get("engines") or {}).get(engine) or {}
+    settings = config.get("dispatch") or {}
+    hedge_after = float(engine_config.get("hedge_after_seconds", DEFAULT_HEDGE_AFTER_SECONDS))
+    request_timeout = float(engine_config.get("request_timeout_seconds", DEFAULT_REQUEST_TIMEOUT_SECONDS))
+    chain = engine_chain(engine, config, primary_model)
+    if not chain: raise ValueError(f"No models configured for engine '{engine}'.")
+    if settings.get("reorder_chain", True):
+        stats = model_stats(chain, int(settings.get("stats_window", 50)), float(settings.get("stats_max_age_hours", 6.0)))
+        chain = order_chain(chain, stats, int(settings.get("min_samples", 5)), float(settings.get("error_penalty", 4.0)))
+
+    def call(model: str) -> Any:
+        provider = provider_for(model)
+        started = time.monotonic()
+        try:
+            text = PROVIDER_CALLS[provider](model, _api_key(provider, api_keys), system_prompt, user_prompt,
+                                            max_tokens, json_mode, request_timeout)
+            output = parse(text) if parse else text
+        except Exception:
+            record(model, time.monotonic() - started, False)
+            raise
+        record(model, time.monotonic() - started, True)
+        return output
+
+    started = time.monotonic()
+    deadline = started + request_timeout + hedge_after * (len(chain) - 1)
+    pending: Dict[Any, str] = {}
+    attempted: List[str] = []
+    errors: Dict[str, str] = {}
+
+    def launch():
+        model = chain[len(attempted)]
+        attempted.append(model)
+        pending[_run_detached(call, model)] = model
+
+    launch()
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0: break
+        can_hedge = len(attempted) < len(chain)
+        done, _ = wait(list(pending), timeout=min(hedge_after, remaining) if can_hedge else remaining,
+                       return_when=FIRST_COMPLETED)
+        if not done:
+            if can_hedge:
+                print(f"INFO: [Model Dispatch] {engine}: no answer after {hedge_after}s, hedging with {chain[len(attempted)]}.")
+                launch()
+            continue
+        for future in done:
+            model = pending.pop(future)
+            try:
+                output = future.result()
+            except Exception as e:
+                errors[model] = str(e)
+                print(f"ERROR: [Model Dispatch] {engine}: {model} failed. Error: {e}")
+                if len(attempted) < len(chain): launch()
+                continue
+            latency = round(time.monotonic() - started, 3)
+            print(f"INFO: [Model Dispatch] {engine}: answered by {model} in {latency}s (tried {attempted}).")
+            return {"model": model, "output": output, "latency_seconds": latency, "attempted": list(attempted)}
+    raise RuntimeError(f"All models failed for engine '{engine}': {json.dumps(errors) if errors else 'deadline exceeded'}")
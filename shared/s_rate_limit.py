@@ -0,0 +1,42 @@
+# Thread-safe token bucket shared by anything that must stay under an API budget.
+import time, threading
+from typing import Optional
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """`rate` tokens are added per second, up to `capacity` (defaults to one second's worth)."""
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Takes tokens if available right now, without blocking."""
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Blocks until tokens are available; returns False if `timeout` seconds pass first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return False
+                wait = min(wait, remaining)
+            time.sleep(wait)